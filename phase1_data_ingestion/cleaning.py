@@ -1,8 +1,60 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Sequence
 
+import pandas as pd
 
+# Raw dataset column -> cleaned Restaurant field, in ORM column order.
+RAW_TO_FIELD: Dict[str, str] = {
+    "name": "name",
+    "url": "url",
+    "address": "address",
+    "location": "location",
+    "listed_in(city)": "listed_in_city",
+    "listed_in(type)": "listed_in_type",
+    "rest_type": "rest_type",
+    "online_order": "online_order",
+    "book_table": "book_table",
+    "rate": "rating",
+    "votes": "votes",
+    "approx_cost(for two people)": "approx_cost_for_two",
+    "cuisines": "cuisines",
+    "dish_liked": "dish_liked",
+    "reviews_list": "reviews_list",
+    "menu_item": "menu_item",
+    "phone": "phone",
+}
+
+# Fixed raw column order expected by `clean_tuple`.
+RAW_COLUMNS = tuple(RAW_TO_FIELD)
+
+# Lowercased Yes/No style tokens and the boolean they stand for.
+_BOOL_MAP: Dict[str, bool] = {
+    "yes": True,
+    "y": True,
+    "true": True,
+    "t": True,
+    "no": False,
+    "n": False,
+    "false": False,
+    "f": False,
+}
+
+# Rating placeholders used by the dataset for unrated restaurants.
+_NULL_RATINGS = frozenset({"", "NEW", "-", "NEW\\n"})
+
+# Anything that is not an ASCII digit, stripped from cost strings like "₹1,200".
+_NON_DIGIT_RE = re.compile(r"[^0-9]")
+
+# The raw value parsers are pure and the dataset repeats the same strings
+# (ratings, costs, Yes/No flags, cuisine lists) across many rows, so each
+# one memoizes its results up to this many distinct inputs.
+_PARSE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE, typed=True)
 def parse_rating(raw: Optional[str]) -> Optional[float]:
     """
     Parse rating strings like '4.1/5', 'NEW', '-', or None into a float.
@@ -11,14 +63,12 @@ def parse_rating(raw: Optional[str]) -> Optional[float]:
         return None
 
     raw = raw.strip()
-    if not raw or raw in {"NEW", "-", "NEW\\n"}:
+    if raw in _NULL_RATINGS:
         return None
 
     # Some entries look like '4.1/5' or '4.1'
     try:
-        if "/" in raw:
-            raw = raw.split("/", 1)[0]
-        value = float(raw)
+        value = float(raw.partition("/")[0])
         if value <= 0:
             return None
         return value
@@ -26,6 +76,7 @@ def parse_rating(raw: Optional[str]) -> Optional[float]:
         return None
 
 
+@lru_cache(maxsize=_PARSE_CACHE_SIZE, typed=True)
 def parse_cost_for_two(raw: Optional[str]) -> Optional[int]:
     """
     Parse approximate cost strings into integer rupees.
@@ -39,8 +90,11 @@ def parse_cost_for_two(raw: Optional[str]) -> Optional[int]:
     text = str(raw).strip()
     if not text or text == "nan":
         return None
-    # Remove commas and non-digit suffixes
-    digits = "".join(ch for ch in text if ch.isdigit())
+    # Common case: plain digits with thousands separators, handled in C
+    digits = text.replace(",", "")
+    if not digits.isdigit():
+        # Remove non-digit prefixes/suffixes
+        digits = _NON_DIGIT_RE.sub("", text)
     if not digits:
         return None
     try:
@@ -52,6 +106,7 @@ def parse_cost_for_two(raw: Optional[str]) -> Optional[int]:
         return None
 
 
+@lru_cache(maxsize=_PARSE_CACHE_SIZE, typed=True)
 def normalize_bool(raw: Optional[str]) -> Optional[bool]:
     """
     Normalize Yes/No style fields into booleans.
@@ -59,16 +114,10 @@ def normalize_bool(raw: Optional[str]) -> Optional[bool]:
     """
     if raw is None:
         return None
-    text = str(raw).strip().lower()
-    if not text:
-        return None
-    if text in {"yes", "y", "true", "t"}:
-        return True
-    if text in {"no", "n", "false", "f"}:
-        return False
-    return None
+    return _BOOL_MAP.get(str(raw).strip().lower())
 
 
+@lru_cache(maxsize=_PARSE_CACHE_SIZE, typed=True)
 def normalize_cuisines(raw: Optional[str]) -> Optional[str]:
     """
     Normalize cuisines field into a comma-separated, lowercased list.
@@ -79,18 +128,62 @@ def normalize_cuisines(raw: Optional[str]) -> Optional[str]:
     if not text:
         return None
 
-    parts = [p.strip() for p in text.split(",") if p.strip()]
+    parts = [p for p in map(str.strip, text.split(",")) if p]
     if not parts:
         return None
-    # Keep original casing for display but de-duplicate
-    seen = set()
-    normalized: list[str] = []
+    # Keep original casing for display but de-duplicate case-insensitively;
+    # dict keeps the first spelling seen for each lowercased key.
+    first_seen: Dict[str, str] = {}
     for p in parts:
-        key = p.lower()
-        if key not in seen:
-            seen.add(key)
-            normalized.append(p)
-    return ", ".join(normalized)
+        first_seen.setdefault(p.lower(), p)
+    return ", ".join(first_seen.values())
+
+
+def clean_tuple(values: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Clean one raw row given as a sequence of values in `RAW_COLUMNS` order.
+
+    Unpacking a fixed column order binds every field to a local in one step,
+    avoiding a keyed lookup per field.
+    """
+    (
+        name,
+        url,
+        address,
+        location,
+        listed_in_city,
+        listed_in_type,
+        rest_type,
+        online_order,
+        book_table,
+        rate,
+        votes,
+        approx_cost,
+        cuisines,
+        dish_liked,
+        reviews_list,
+        menu_item,
+        phone,
+    ) = values
+    return {
+        "name": (name or "").strip(),
+        "url": url or None,
+        "address": address or None,
+        "location": location or None,
+        "listed_in_city": listed_in_city or None,
+        "listed_in_type": listed_in_type or None,
+        "rest_type": rest_type or None,
+        "online_order": normalize_bool(online_order),
+        "book_table": normalize_bool(book_table),
+        "rating": parse_rating(rate),
+        "votes": int(votes) if votes not in (None, "") else None,
+        "approx_cost_for_two": parse_cost_for_two(approx_cost),
+        "cuisines": normalize_cuisines(cuisines),
+        "dish_liked": dish_liked or None,
+        "reviews_list": reviews_list or None,
+        "menu_item": menu_item or None,
+        "phone": phone or None,
+    }
 
 
 def clean_record(raw_row: Dict[str, Any]) -> Dict[str, Any]:
@@ -98,25 +191,87 @@ def clean_record(raw_row: Dict[str, Any]) -> Dict[str, Any]:
     Transform a raw dataset row dict into a cleaned structure that matches
     the Restaurant ORM fields.
     """
-    return {
-        "name": (raw_row.get("name") or "").strip(),
-        "url": (raw_row.get("url") or None),
-        "address": (raw_row.get("address") or None),
-        "location": (raw_row.get("location") or None),
-        "listed_in_city": (raw_row.get("listed_in(city)") or None),
-        "listed_in_type": (raw_row.get("listed_in(type)") or None),
-        "rest_type": (raw_row.get("rest_type") or None),
-        "online_order": normalize_bool(raw_row.get("online_order")),
-        "book_table": normalize_bool(raw_row.get("book_table")),
-        "rating": parse_rating(raw_row.get("rate")),
-        "votes": int(raw_row["votes"]) if raw_row.get("votes") not in (None, "") else None,
-        "approx_cost_for_two": parse_cost_for_two(raw_row.get("approx_cost(for two people)")),
-        "cuisines": normalize_cuisines(raw_row.get("cuisines")),
-        "dish_liked": raw_row.get("dish_liked") or None,
-        "reviews_list": raw_row.get("reviews_list") or None,
-        "menu_item": raw_row.get("menu_item") or None,
-        "phone": raw_row.get("phone") or None,
-    }
+    return clean_tuple(tuple(map(raw_row.get, RAW_COLUMNS)))
+
+
+def _none_for_missing(frame):
+    """
+    Replace NaN/NA markers with None so values bind cleanly to the DB driver.
+    """
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def _parse_distinct(values: pd.Series, parse: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Run a vectorized parser over the distinct values of `values` only and
+    broadcast the results back; missing values stay missing.
+
+    Ratings and costs take a few dozen distinct strings across thousands of
+    rows, so the string work shrinks to a factorize plus a gather.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype=object)).reset_index(drop=True)
+    # Code -1 marks a missing value; reindex maps it to NA
+    return parsed.reindex(codes).set_axis(values.index)
+
+
+def clean_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized equivalent of `clean_record` over a DataFrame of raw rows.
+
+    Each column is cleaned in one pandas pass instead of one Python call per
+    row and field. Rows without a valid name are dropped, and missing values
+    are returned as None.
+    """
+    raw = _none_for_missing(df.reindex(columns=list(RAW_TO_FIELD)))
+
+    def text(column: str) -> pd.Series:
+        values = raw[column]
+        return values.where(values != "", None)
+
+    def flag(column: str) -> pd.Series:
+        lowered = raw[column].astype("string").str.strip().str.lower()
+        return lowered.map(_BOOL_MAP)
+
+    rating = _parse_distinct(
+        raw["rate"],
+        lambda values: pd.to_numeric(
+            values.astype("string").str.strip().str.split("/", n=1).str[0],
+            errors="coerce",
+        ),
+    )
+    cost = _parse_distinct(
+        raw["approx_cost(for two people)"],
+        lambda values: pd.to_numeric(
+            values.astype("string").str.replace(_NON_DIGIT_RE, "", regex=True),
+            errors="coerce",
+        ).astype("Int64"),
+    )
+
+    cleaned = pd.DataFrame(
+        {
+            "name": raw["name"].fillna("").astype(str).str.strip(),
+            "url": text("url"),
+            "address": text("address"),
+            "location": text("location"),
+            "listed_in_city": text("listed_in(city)"),
+            "listed_in_type": text("listed_in(type)"),
+            "rest_type": text("rest_type"),
+            "online_order": flag("online_order"),
+            "book_table": flag("book_table"),
+            "rating": rating.where(rating > 0),
+            "votes": pd.to_numeric(text("votes"), errors="coerce").astype("Int64"),
+            "approx_cost_for_two": cost.where(cost > 0),
+            "cuisines": raw["cuisines"].map(normalize_cuisines),
+            "dish_liked": text("dish_liked"),
+            "reviews_list": text("reviews_list"),
+            "menu_item": text("menu_item"),
+            "phone": text("phone"),
+        },
+        index=raw.index,
+    )
+    cleaned = cleaned[cleaned["name"] != ""]
+    return _none_for_missing(cleaned).reset_index(drop=True)
 
 
 __all__ = [
@@ -124,6 +279,10 @@ __all__ = [
     "parse_cost_for_two",
     "normalize_bool",
     "normalize_cuisines",
+    "clean_tuple",
     "clean_record",
+    "clean_batch",
+    "RAW_TO_FIELD",
+    "RAW_COLUMNS",
 ]
 
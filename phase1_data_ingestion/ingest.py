@@ -10,22 +10,48 @@ Responsibilities:
 - Persist restaurants into the database in batches.
 """
 
-from typing import Iterable, Mapping
+import queue
+import threading
+from typing import Iterable, Iterator, Mapping, TypeVar, Union
 
+import pandas as pd
 from datasets import load_dataset
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
-from .cleaning import clean_record
+from .cleaning import clean_batch, clean_record
 from .config import settings
-from .models import Base, Restaurant
+from .models import Base, Restaurant, add_indexes
+from .sqlite_pragmas import apply_sqlite_pragmas
+
+T = TypeVar("T")
+
+# Number of dataset batches fetched ahead of the insert loop
+PREFETCH_BATCHES = 4
+
+# Bulk-load tuning for SQLite: WAL with NORMAL sync avoids an fsync per
+# commit, and the large page cache / mmap keep the working set in memory.
+INGEST_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -200000,
+    "mmap_size": 268435456,
+}
+
+
+# Restaurant columns copied from ORM instances; ids are assigned by the database.
+_RESTAURANT_FIELDS = tuple(
+    column.key for column in Restaurant.__table__.columns if column.key != "id"
+)
 
 
 def get_engine():
     """
     Create a SQLAlchemy engine using configuration from settings.
     """
-    return create_engine(settings.db_url, future=True)
+    engine = create_engine(settings.db_url, future=True)
+    return apply_sqlite_pragmas(engine, INGEST_SQLITE_PRAGMAS)
 
 
 def init_db(engine=None) -> None:
@@ -35,6 +61,7 @@ def init_db(engine=None) -> None:
     if engine is None:
         engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    add_indexes(engine)
 
 
 def iter_clean_restaurants(rows: Iterable[Mapping]) -> Iterable[Restaurant]:
@@ -49,23 +76,77 @@ def iter_clean_restaurants(rows: Iterable[Mapping]) -> Iterable[Restaurant]:
         yield Restaurant(**cleaned)
 
 
-def bulk_insert_restaurants(session: Session, restaurants: Iterable[Restaurant]) -> int:
+def bulk_insert_restaurants(
+    session: Session, restaurants: Iterable[Union[Restaurant, Mapping]]
+) -> int:
     """
-    Insert a batch of Restaurant objects and return count inserted.
+    Insert a batch of Restaurant objects (or cleaned row dicts) and return
+    count inserted.
+
+    Rows go through one Core executemany instead of the ORM unit of work,
+    so there is no identity map or per-object flush bookkeeping.
     """
-    batch = list(restaurants)
+    batch = [
+        row if isinstance(row, Mapping) else {key: getattr(row, key) for key in _RESTAURANT_FIELDS}
+        for row in restaurants
+    ]
     if not batch:
         return 0
-    session.add_all(batch)
+    session.execute(Restaurant.__table__.insert(), batch)
     session.commit()
     return len(batch)
 
 
+def prefetch(iterable: Iterable[T], buffer: int = PREFETCH_BATCHES) -> Iterator[T]:
+    """
+    Iterate `iterable` on a background thread, keeping up to `buffer` items ready.
+
+    This lets a network-bound producer (the HF streaming iterator) keep
+    fetching while the caller cleans and inserts. Exceptions raised by the
+    producer are re-raised in the caller.
+    """
+    items: queue.Queue = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except BaseException as exc:  # re-raised on the consumer side
+            put((False, exc))
+            return
+        put((False, None))
+
+    threading.Thread(target=produce, name="ingest-prefetch", daemon=True).start()
+    try:
+        while True:
+            ok, payload = items.get()
+            if not ok:
+                if payload is not None:
+                    raise payload
+                return
+            yield payload
+    finally:
+        stop.set()
+
+
 def ingest_from_huggingface(max_records: int = 1000) -> int:
     """
     Main ingestion routine:
     - Loads the configured HF dataset using streaming to save disk space.
-    - Cleans and inserts rows until max_records is reached.
+    - Cleans each batch of rows column-wise and bulk-inserts it with Core
+      executemany inside a single transaction until max_records is reached.
     """
     engine = get_engine()
     init_db(engine)
@@ -75,29 +156,18 @@ def ingest_from_huggingface(max_records: int = 1000) -> int:
 
     total_inserted = 0
     batch_size = settings.ingest_batch_size
-    
-    with Session(engine) as session:
-        batch = []
-        for row in ds:
+    insert_stmt = Restaurant.__table__.insert()
+
+    # One transaction for the whole load; each batch is a single executemany
+    with engine.begin() as conn:
+        # Network fetches for upcoming batches overlap with cleaning + inserts
+        for batch in prefetch(ds.iter(batch_size=batch_size)):
+            cleaned = clean_batch(pd.DataFrame(batch)).head(max_records - total_inserted)
+            if not cleaned.empty:
+                conn.execute(insert_stmt, cleaned.to_dict("records"))
+                total_inserted += len(cleaned)
             if total_inserted >= max_records:
                 break
-                
-            cleaned = clean_record(row)
-            if not cleaned["name"]:
-                continue
-                
-            batch.append(Restaurant(**cleaned))
-            
-            if len(batch) >= batch_size:
-                session.add_all(batch)
-                session.commit()
-                total_inserted += len(batch)
-                batch = []
-                
-        if batch:
-            session.add_all(batch)
-            session.commit()
-            total_inserted += len(batch)
 
     return total_inserted
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from sqlalchemy import (
     Column,
@@ -9,12 +10,27 @@ from sqlalchemy import (
     Float,
     Boolean,
     Text,
+    Index,
+    func,
 )
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.schema import CreateIndex
 
 Base = declarative_base()
 
 
+@lru_cache(maxsize=8192)
+def split_cuisines(text: Optional[str]) -> Tuple[str, ...]:
+    """
+    Split a comma-separated cuisines string into trimmed, non-empty names.
+
+    Many restaurants share the same cuisines string, so results are cached.
+    """
+    if not text:
+        return ()
+    return tuple(part for part in map(str.strip, text.split(",")) if part)
+
+
 class Restaurant(Base):
     """
     Core restaurant table based on the Zomato dataset fields.
@@ -23,6 +39,14 @@ class Restaurant(Base):
     """
 
     __tablename__ = "restaurants"
+    __table_args__ = (
+        Index("ix_restaurants_listed_in_city", "listed_in_city"),
+        # Lets the distinct-locations lookup read the index instead of the table
+        Index("ix_restaurants_location", "location"),
+        Index("ix_restaurants_rating", "rating"),
+        # Budget-only searches (no location) range-scan on cost
+        Index("ix_restaurants_cost_for_two", "approx_cost_for_two"),
+    )
 
     id: int = Column(Integer, primary_key=True, autoincrement=True)
 
@@ -56,5 +80,29 @@ class Restaurant(Base):
     phone: Optional[str] = Column(String(255), nullable=True)
 
 
-__all__ = ["Base", "Restaurant"]
+# Case-insensitive location lookups filter on lower(location); an expression
+# index lets them seek instead of scanning, with rating for the range filter.
+Index(
+    "ix_restaurants_location_lower_rating",
+    func.lower(Restaurant.location),
+    Restaurant.rating,
+)
+
+
+def add_indexes(engine) -> None:
+    """
+    Create any declared index that is missing from an existing database.
+
+    `create_all` only emits indexes alongside tables it creates, so databases
+    built before an index was declared need this to pick it up.
+    """
+    # IF NOT EXISTS rather than checkfirst: expression indexes are not
+    # reflected, so a checkfirst lookup would never find them.
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+__all__ = ["Base", "Restaurant", "add_indexes", "split_cuisines"]
 
@@ -0,0 +1,45 @@
+"""
+SQLite connection tuning shared by the pipeline phases.
+
+Each phase builds its own engine; this helper attaches a connect hook that
+applies a set of PRAGMAs to every new SQLite connection.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Mapping, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PragmaValue = Union[int, str]
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: Mapping[str, PragmaValue]) -> Engine:
+    """
+    Run the given PRAGMAs on every new DB-API connection of a SQLite engine.
+
+    Other dialects are left untouched. A PRAGMA the database rejects (for
+    example switching a read-only file to WAL) is skipped so the connection
+    remains usable.
+    """
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                try:
+                    cursor.execute(f"PRAGMA {name}={value}")
+                except sqlite3.OperationalError:
+                    continue
+        finally:
+            cursor.close()
+
+    return engine
+
+
+__all__ = ["apply_sqlite_pragmas"]
@@ -22,6 +22,9 @@ class FeatureSettings:
     # Embedding settings
     embedding_dim: int = int(os.getenv("EMBEDDING_DIM", "16"))
 
+    # Rows streamed from the DB and bulk-inserted per feature batch
+    features_batch_size: int = int(os.getenv("FEATURES_BATCH_SIZE", "1000"))
+
 
 settings = FeatureSettings()
 
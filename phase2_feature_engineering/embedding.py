@@ -1,7 +1,50 @@
 from __future__ import annotations
 
 import hashlib
-from typing import List
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+import numpy as np
+
+
+# Scale factor mapping an unsigned 32-bit integer onto [0, 1].
+_INV_UINT32_MAX = 1.0 / float(2**32 - 1)
+
+# Distinct (text, dim) digests kept in memory; search texts repeat across
+# feature runs and query-time lookups.
+_DIGEST_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_DIGEST_CACHE_SIZE)
+def _embedding_digest(text: str, dim: int) -> bytes:
+    """
+    Return `dim * 4` bytes of BLAKE2b output for `text`.
+
+    A single BLAKE2b call yields up to 64 bytes (16 dimensions); larger
+    dimensions chain further calls personalised with the block index.
+    Digests are immutable bytes, so they are memoized and shared by
+    `compute_embedding` and `compute_embeddings_batch`.
+    """
+    data = (text or "").encode("utf-8")
+    nbytes = dim * 4
+    if nbytes <= 64:
+        return hashlib.blake2b(data, digest_size=max(nbytes, 1)).digest()[:nbytes]
+    blocks = [
+        hashlib.blake2b(data, digest_size=64, person=block.to_bytes(16, "little")).digest()
+        for block in range((nbytes + 63) // 64)
+    ]
+    return b"".join(blocks)[:nbytes]
+
+
+def _digest_to_vectors(digest: bytes, dim: int) -> np.ndarray:
+    """
+    Map concatenated digests of big-endian uint32 words onto [0, 1] floats.
+
+    Returns an array of shape `(len(digest) // (dim * 4), dim)`; the
+    byte-to-float conversion runs entirely inside NumPy.
+    """
+    words = np.frombuffer(digest, dtype=">u4").reshape(-1, dim)
+    return words * _INV_UINT32_MAX
 
 
 def compute_embedding(text: str, dim: int) -> List[float]:
@@ -12,30 +55,43 @@ def compute_embedding(text: str, dim: int) -> List[float]:
     exercise the indexing pipeline without external ML dependencies.
 
     Approach:
-    - For each dimension, hash text + dimension index with SHA256.
-    - Convert first 4 bytes of digest to an integer.
-    - Normalize to [0, 1] by dividing by 2**32 - 1.
+    - Hash the text once with BLAKE2b, producing 4 bytes per dimension.
+    - Read each 4-byte chunk as a big-endian unsigned integer.
+    - Normalize to [0, 1] by scaling with 1 / (2**32 - 1).
     """
-    if not text:
-        text = ""
+    if dim <= 0:
+        return []
+    return _digest_to_vectors(_embedding_digest(text, dim), dim)[0].tolist()
 
-    vector: List[float] = []
-    for i in range(dim):
-        h = hashlib.sha256()
-        h.update(text.encode("utf-8"))
-        h.update(i.to_bytes(4, byteorder="little", signed=False))
-        digest = h.digest()
-        # Use first 4 bytes
-        val_int = int.from_bytes(digest[:4], byteorder="big", signed=False)
-        vector.append(val_int / float(2**32 - 1))
-    return vector
+
+def compute_embeddings_batch(texts: Sequence[str], dim: int) -> np.ndarray:
+    """
+    Compute embeddings for many texts at once.
+
+    Returns an `(len(texts), dim)` float64 array whose rows match
+    `compute_embedding` for the corresponding text. Hashing runs once per
+    text and all digests are converted to floats in a single NumPy pass.
+    """
+    if not texts or dim <= 0:
+        return np.zeros((len(texts), max(dim, 0)), dtype=np.float64)
+    digest = b"".join(_embedding_digest(text, dim) for text in texts)
+    return _digest_to_vectors(digest, dim)
 
 
-def vector_to_string(vec: List[float]) -> str:
+@lru_cache(maxsize=8)
+def _row_format(dim: int) -> str:
+    return ",".join(["%.6f"] * dim)
+
+
+def vector_to_string(vec: Sequence[float]) -> str:
     """
-    Serialize a vector to a comma-separated string.
+    Serialize a vector (list or NumPy array) to a comma-separated string.
+
+    All values are formatted by a single `%` operation against a cached
+    per-dimension template instead of one f-string per element.
     """
-    return ",".join(f"{v:.6f}" for v in vec)
+    values = np.asarray(vec, dtype=np.float64).ravel().tolist()
+    return _row_format(len(values)) % tuple(values)
 
 
 def string_to_vector(text: str) -> List[float]:
@@ -47,5 +103,33 @@ def string_to_vector(text: str) -> List[float]:
     return [float(part) for part in text.split(",") if part]
 
 
-__all__ = ["compute_embedding", "vector_to_string", "string_to_vector"]
+def vector_to_bytes(vec: Sequence[float]) -> bytes:
+    """
+    Pack a vector as little-endian float32 bytes for BLOB storage.
+    """
+    return np.asarray(vec, dtype="<f4").tobytes()
+
+
+def bytes_to_vector(blob: Union[bytes, str, None]) -> np.ndarray:
+    """
+    Read a stored embedding back as a float32 array without copying.
+
+    Rows written before embeddings moved to BLOB storage hold
+    comma-separated text; those are parsed with `string_to_vector`.
+    """
+    if not blob:
+        return np.empty(0, dtype="<f4")
+    if isinstance(blob, str):
+        return np.asarray(string_to_vector(blob), dtype="<f4")
+    return np.frombuffer(blob, dtype="<f4")
+
+
+__all__ = [
+    "compute_embedding",
+    "compute_embeddings_batch",
+    "vector_to_string",
+    "string_to_vector",
+    "vector_to_bytes",
+    "bytes_to_vector",
+]
 
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session
 
 from phase1_data_ingestion.models import Base, Restaurant
+from phase1_data_ingestion.sqlite_pragmas import apply_sqlite_pragmas
 from .config import settings
-from .embedding import compute_embedding, vector_to_string
+from .embedding import compute_embedding, compute_embeddings_batch, vector_to_bytes
 from .models import RestaurantFeatures
 
 
@@ -61,87 +61,136 @@ def compute_popularity_score(rating: Optional[float], votes: Optional[int]) -> O
     return r * math.log10(1 + v)
 
 
-def has_keyword(value: Optional[str], keyword: str) -> Optional[bool]:
-    if value is None:
+def _type_text(rest: Restaurant) -> Optional[str]:
+    """
+    Lowercased rest_type and listed_in_type joined into one string.
+
+    Returns None when both fields are missing, so keyword flags can report
+    "unknown" rather than False.
+    """
+    if rest.rest_type is None and rest.listed_in_type is None:
+        return None
+    return f"{rest.rest_type or ''}|{rest.listed_in_type or ''}".lower()
+
+
+def _flag_keyword(type_text: Optional[str], keyword: str) -> Optional[bool]:
+    if type_text is None:
         return None
-    return keyword.lower() in value.lower()
+    return keyword in type_text
 
 
 def infer_has_buffet(rest: Restaurant) -> Optional[bool]:
     """
     Detect buffet-oriented restaurants based on rest_type or listed_in_type.
     """
-    flagged = any(
-        has_keyword(field, "buffet")
-        for field in [rest.rest_type, rest.listed_in_type]
-    )
-    # If we couldn't find any evidence, return None instead of False.
-    if not flagged and all(f is None for f in [rest.rest_type, rest.listed_in_type]):
-        return None
-    return flagged
+    return _flag_keyword(_type_text(rest), "buffet")
 
 
 def infer_is_cafe(rest: Restaurant) -> Optional[bool]:
-    flagged = any(
-        has_keyword(field, "cafe") for field in [rest.rest_type, rest.listed_in_type]
-    )
-    if not flagged and all(f is None for f in [rest.rest_type, rest.listed_in_type]):
-        return None
-    return flagged
+    return _flag_keyword(_type_text(rest), "cafe")
 
 
 def build_search_text(rest: Restaurant) -> str:
     """
     Compose a unified search text field from multiple restaurant attributes.
     """
-    parts = [
-        rest.name or "",
-        rest.location or "",
-        rest.listed_in_city or "",
-        rest.listed_in_type or "",
-        rest.rest_type or "",
-        rest.cuisines or "",
-        rest.dish_liked or "",
-    ]
-    return " | ".join(p for p in parts if p)
+    # filter(None, ...) drops missing/empty fields without a Python-level predicate
+    parts = (
+        rest.name,
+        rest.location,
+        rest.listed_in_city,
+        rest.listed_in_type,
+        rest.rest_type,
+        rest.cuisines,
+        rest.dish_liked,
+    )
+    return " | ".join(filter(None, parts))
 
 
 def build_features_for_restaurant(rest: Restaurant) -> RestaurantFeatures:
     """
     Construct a RestaurantFeatures object from a Restaurant row.
     """
-    rating_bucket = compute_rating_bucket(rest.rating)
-    price_bucket = compute_price_bucket(rest.approx_cost_for_two)
-    popularity_score = compute_popularity_score(rest.rating, rest.votes)
-    has_buffet = infer_has_buffet(rest)
-    is_cafe = infer_is_cafe(rest)
-    supports_online_order = rest.online_order
-    supports_table_booking = rest.book_table
     search_text = build_search_text(rest)
-
     # Simple deterministic embedding for now
     embedding_vec = compute_embedding(search_text, settings.embedding_dim)
-    embedding_str = vector_to_string(embedding_vec)
-
     return RestaurantFeatures(
-        restaurant_id=rest.id,
-        rating_bucket=rating_bucket,
-        price_bucket=price_bucket,
-        popularity_score=popularity_score,
-        has_buffet=has_buffet,
-        is_cafe=is_cafe,
-        supports_online_order=supports_online_order,
-        supports_table_booking=supports_table_booking,
-        search_text=search_text,
-        embedding=embedding_str,
+        **_feature_values(rest, search_text, vector_to_bytes(embedding_vec))
     )
 
 
+def _feature_values(
+    rest: Restaurant,
+    search_text: str,
+    embedding_blob: bytes,
+) -> Dict[str, Any]:
+    """
+    Combine precomputed search text and packed embedding with the derived
+    features, keyed by RestaurantFeatures column name.
+    """
+    # Lowercase the type fields once and scan them for every keyword flag
+    type_text = _type_text(rest)
+    return {
+        "restaurant_id": rest.id,
+        "rating_bucket": compute_rating_bucket(rest.rating),
+        "price_bucket": compute_price_bucket(rest.approx_cost_for_two),
+        "popularity_score": compute_popularity_score(rest.rating, rest.votes),
+        "has_buffet": _flag_keyword(type_text, "buffet"),
+        "is_cafe": _flag_keyword(type_text, "cafe"),
+        "supports_online_order": rest.online_order,
+        "supports_table_booking": rest.book_table,
+        "search_text": search_text,
+        "embedding": embedding_blob,
+    }
+
+
+def _feature_rows(restaurants: List[Restaurant]) -> List[Dict[str, Any]]:
+    """
+    Build feature rows for a chunk of restaurants, embedding all of their
+    search texts in one batched pass.
+    """
+    texts = [build_search_text(rest) for rest in restaurants]
+    embeddings = compute_embeddings_batch(texts, settings.embedding_dim).astype("<f4")
+    return [
+        _feature_values(rest, search_text, embedding_vec.tobytes())
+        for rest, search_text, embedding_vec in zip(restaurants, texts, embeddings)
+    ]
+
+
+# Columns read by feature generation; leaves out wide text such as
+# reviews_list and menu_item. Rows expose them as attributes, like Restaurant.
+_FEATURE_SOURCE_COLUMNS = (
+    Restaurant.id,
+    Restaurant.name,
+    Restaurant.location,
+    Restaurant.listed_in_city,
+    Restaurant.listed_in_type,
+    Restaurant.rest_type,
+    Restaurant.online_order,
+    Restaurant.book_table,
+    Restaurant.rating,
+    Restaurant.votes,
+    Restaurant.approx_cost_for_two,
+    Restaurant.cuisines,
+    Restaurant.dish_liked,
+)
+
+
+# Feature generation rewrites a row per restaurant in one transaction;
+# WAL with NORMAL sync skips the per-commit fsync and keeps temp data in RAM.
+FEATURE_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+}
+
+
 def get_engine():
     """
     Create a SQLAlchemy engine pointing at the main DB.
     """
-    return create_engine(settings.db_url, future=True)
+    engine = create_engine(settings.db_url, future=True)
+    return apply_sqlite_pragmas(engine, FEATURE_SQLITE_PRAGMAS)
 
 
 def init_feature_schema(engine=None) -> None:
@@ -165,24 +214,23 @@ def generate_features_for_all(engine=None) -> int:
     init_feature_schema(engine)
 
     created = 0
-    with Session(engine) as session:
-        # Find restaurants that do not yet have features
-        existing_ids = {
-            rid
-            for rid in session.execute(select(RestaurantFeatures.restaurant_id)).scalars()
-        }
-
-        restaurants = (
-            session.execute(select(Restaurant).order_by(Restaurant.id)).scalars().all()
+    batch_size = settings.features_batch_size
+    insert_stmt = RestaurantFeatures.__table__.insert()
+    # One transaction for the whole pass; each chunk is a single executemany
+    with engine.begin() as conn:
+        # Anti-join: only restaurants without a features row, filtered by
+        # the database on the restaurant_features primary key.
+        stmt = (
+            select(*_FEATURE_SOURCE_COLUMNS)
+            .outerjoin(RestaurantFeatures, Restaurant.id == RestaurantFeatures.restaurant_id)
+            .where(RestaurantFeatures.restaurant_id.is_(None))
+            .order_by(Restaurant.id)
+            .execution_options(yield_per=batch_size)
         )
-        for rest in restaurants:
-            if rest.id in existing_ids:
-                continue
-            features = build_features_for_restaurant(rest)
-            session.add(features)
-            created += 1
-
-        session.commit()
+        # Stream restaurants in chunks rather than loading the whole table
+        for chunk in conn.execute(stmt).partitions():
+            conn.execute(insert_stmt, _feature_rows(list(chunk)))
+            created += len(chunk)
     return created
 
 
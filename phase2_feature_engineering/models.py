@@ -8,6 +8,7 @@ from sqlalchemy import (
     Float,
     Boolean,
     Text,
+    LargeBinary,
     ForeignKey,
 )
 from sqlalchemy.orm import relationship
@@ -46,8 +47,8 @@ class RestaurantFeatures(Base):
     # Text for semantic search
     search_text: Optional[str] = Column(Text, nullable=True)
 
-    # Simple deterministic embedding stored as comma-separated floats
-    embedding: Optional[str] = Column(Text, nullable=True)
+    # Simple deterministic embedding stored as little-endian float32 bytes
+    embedding: Optional[bytes] = Column(LargeBinary, nullable=True)
 
     # Relationship back to the base restaurant
     restaurant = relationship(Restaurant, backref="features", lazy="joined")
@@ -24,6 +24,14 @@ class LLMSettings:
     # Fallback behaviour
     use_llm_by_default: bool = bool(int(os.getenv("USE_LLM_BY_DEFAULT", "0")))
 
+    # Max candidates sent to Groq per request; the rest are ranked locally
+    # and appended after the LLM-ranked ones.
+    max_llm_candidates: int = int(os.getenv("LLM_MAX_CANDIDATES", "20"))
+
+    # Cache of Groq-parsed preferences keyed on (query, location hint); 0 disables it
+    prefs_cache_size: int = int(os.getenv("PREFS_CACHE_SIZE", "1024"))
+    prefs_cache_ttl: int = int(os.getenv("PREFS_CACHE_TTL", "3600"))
+
 
 settings = LLMSettings()
 
@@ -1,13 +1,47 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .config import settings
 
 
+def _build_session() -> requests.Session:
+    """
+    Create an HTTP session with pooled keep-alive connections and retries
+    for rate limiting / transient server errors.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_shared_session: Optional[requests.Session] = None
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Return the process-wide session shared by all GroqClient instances, so
+    the TLS handshake to Groq is paid once rather than per call.
+    """
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = _build_session()
+    return _shared_session
+
+
 class GroqClient:
     """
     Minimal Groq client wrapper.
@@ -21,10 +55,16 @@ class GroqClient:
         api_key: str | None = None,
         model: str | None = None,
         base_url: str | None = None,
+        session: requests.Session | None = None,
     ) -> None:
         self.api_key = api_key or settings.groq_api_key
         self.model = model or settings.groq_model
         self.base_url = base_url or settings.groq_base_url
+        self._session = session or get_shared_session()
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
@@ -37,21 +77,20 @@ class GroqClient:
             raise RuntimeError("GroqClient is not configured with an API key.")
 
         url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         payload: Dict[str, Any] = {
             "model": self.model,
             "messages": messages,
             "max_tokens": max_tokens,
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+        # orjson encodes straight to bytes and decodes the raw response body;
+        # the post reuses a pooled keep-alive connection.
+        resp = self._session.post(
+            url, headers=self._headers, data=orjson.dumps(payload), timeout=30
+        )
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         # OpenAI-compatible schema
         return data["choices"][0]["message"]["content"]
 
 
-__all__ = ["GroqClient"]
-
+__all__ = ["GroqClient", "get_shared_session"]
@@ -1,12 +1,176 @@
 from __future__ import annotations
 
-import json
-from typing import List, Optional
+import asyncio
+import re
+from dataclasses import replace
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+import orjson
+
+from .cache import TTLCache
 from .config import settings
 from .groq_client import GroqClient
 from .types import UserPreferences, CandidateRestaurant, LLMRecommendation
 
+# Heuristic query patterns, compiled once at import.
+# Price range like "1000-1500" or "1000 to 1500"
+_PRICE_RANGE_RE = re.compile(r"(\d{3,})\s*(?:-|to|and)\s*(\d{3,})")
+# Upper price bound like "under 1500" or "below rs 500"
+_PRICE_UNDER_RE = re.compile(r"(?:under|below|less than|up to)\s*(?:₹|rs\.?)?\s*(\d{3,})")
+# Rating range followed by "star"/"rating", e.g. "4-5 star"
+_RATING_RANGE_SUFFIX_RE = re.compile(
+    r"\b([0-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([0-5](?:\.[0-9])?)\s*(?:star|rating)"
+)
+# "rating between/from X and Y"
+_RATING_RANGE_PREFIX_RE = re.compile(
+    r"rating(?:s)?\s*(?:between|from)?\s*([1-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([1-5](?:\.[0-9])?)"
+)
+# "between X and Y" without a rating keyword
+_BETWEEN_RANGE_RE = re.compile(r"between\s*([1-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([1-5](?:\.[0-9])?)")
+# Standalone 1.0-5.0 tokens; word boundaries avoid matching inside prices like 1000
+_RATING_TOKEN_RE = re.compile(r"\b([1-5](?:\.[0-9])?)\b")
+# Whitespace runs and trailing sentence punctuation, ignored in cache keys
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = ".!?,; "
+
+
+def _cache_key_text(text: Optional[str]) -> str:
+    """
+    Normalize text for cache keys so near-identical queries share an entry:
+    "Cheap  Chinese!" and "cheap chinese" map to the same key.
+    """
+    return _WHITESPACE_RE.sub(" ", (text or "").lower()).strip(_TRAILING_PUNCT)
+
+# Body of the first fenced code block in an LLM reply, with or without a "json" tag
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _extract_json(text: str) -> str:
+    """
+    Return the JSON payload of an LLM reply: the first fenced code block if
+    present, else the first balanced {...} or [...] span, else the text itself.
+    """
+    match = _FENCE_RE.search(text)
+    if match:
+        return match.group(1).strip()
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text.strip()
+    start = min(starts)
+    opener, closer = text[start], _CLOSERS[text[start]]
+
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == opener:
+            depth += 1
+        elif ch == closer:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:].strip()
+
+
+# Fields sent to the LLM for reranking; query_text is already in the prompt
+_LLM_CANDIDATE_FIELDS = (
+    "id", "name", "location", "cuisines", "rating", "votes", "approx_cost_for_two", "has_buffet",
+)
+_LLM_PREF_FIELDS = (
+    "location", "cuisines", "min_rating", "max_rating", "min_price_for_two", "max_price_for_two",
+    "wants_online_order", "wants_table_booking", "wants_buffet",
+)
+_llm_candidate_values = attrgetter(*_LLM_CANDIDATE_FIELDS)
+_llm_pref_values = attrgetter(*_LLM_PREF_FIELDS)
+
+
+def _llm_projection(fields: Tuple[str, ...], values: Tuple) -> Dict[str, object]:
+    """
+    Zip field names with values, leaving out unknown (None/empty) ones to keep
+    the prompt short.
+    """
+    return {key: value for key, value in zip(fields, values) if value is not None and value != []}
+
+
+def _keyword_matcher(keywords: Iterable[str]) -> "re.Pattern[str]":
+    """
+    Compile keywords into a single alternation. The zero-width lookahead lets
+    one finditer sweep report every (possibly overlapping) keyword occurrence.
+    """
+    alternation = "|".join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))")
+
+
+def _keyword_hits(matcher: "re.Pattern[str]", text: str) -> set:
+    return {m.group(1) for m in matcher.finditer(text)}
+
+
+_COMMON_CUISINES = (
+    "north indian", "south indian", "chinese", "italian", "thai", "asian", "cafe",
+    "desserts", "continental", "mexican", "pizza", "burger", "biryani",
+)
+_CHEAP_WORDS = ("cheap", "budget", "low cost")
+_MID_RANGE_WORDS = ("mid range", "reasonable")
+_EXPENSIVE_WORDS = ("expensive", "fine dining")
+_ONLINE_ORDER_WORDS = ("delivery", "online order", "zomato")
+_TABLE_BOOKING_WORDS = ("date", "table booking", "book", "reserve")
+_BUFFET_WORDS = ("buffet", "unlimited", "all you can eat")
+
+_KEYWORD_RE = _keyword_matcher(
+    _COMMON_CUISINES
+    + _CHEAP_WORDS
+    + _MID_RANGE_WORDS
+    + _EXPENSIVE_WORDS
+    + _ONLINE_ORDER_WORDS
+    + _TABLE_BOOKING_WORDS
+    + _BUFFET_WORDS
+)
+
+
+@lru_cache(maxsize=4)
+def _location_matcher(known_locations: Tuple[str, ...]) -> Tuple[Optional["re.Pattern[str]"], Dict[str, str]]:
+    """
+    Matcher over the known locations. Cached on the location tuple itself,
+    not per database: a changed location list simply builds a new matcher.
+    Returns the pattern and a lowercase -> canonical location map.
+    """
+    by_lower: Dict[str, str] = {}
+    for loc in known_locations:
+        by_lower.setdefault(loc.lower(), loc)
+    if not by_lower:
+        return None, by_lower
+    return _keyword_matcher(by_lower), by_lower
+
+
+def _detect_location(lowered: str) -> Optional[str]:
+    """
+    Known location mentioned in the lowercased query. Nested names resolve to
+    the longest one ("koramangala 5th block" -> "Koramangala 5th Block", not
+    "Koramangala"); among separate mentions the first in sorted order wins.
+    """
+    from phase4_retrieval.retrieval import get_distinct_locations
+
+    matcher, by_lower = _location_matcher(tuple(get_distinct_locations()))
+    if matcher is None:
+        return None
+    hits = _keyword_hits(matcher, lowered)
+    return next((loc for low, loc in by_lower.items() if low in hits), None)
+
 
 class LLMOrchestrator:
     """
@@ -17,6 +181,9 @@ class LLMOrchestrator:
 
     def __init__(self, groq_client: Optional[GroqClient] = None) -> None:
         self.groq_client = groq_client or GroqClient()
+        self._prefs_cache: TTLCache[UserPreferences] = TTLCache(
+            settings.prefs_cache_size, settings.prefs_cache_ttl
+        )
 
     async def parse_preferences(
         self,
@@ -26,14 +193,24 @@ class LLMOrchestrator:
         """
         Extract structured preferences from free-form text.
         If Groq is available, use it for better extraction.
+        Successful Groq parses are cached per normalized (query, location
+        hint); callers always get their own copy. Heuristic results are not
+        cached: they are cheap, depend on the locations in the database, and
+        would otherwise pin a degraded parse after a transient Groq error.
         """
-        if settings.use_llm_by_default and self.groq_client.is_configured():
+        key = (_cache_key_text(query_text), _cache_key_text(location_hint))
+        prefs = self._prefs_cache.get(key)
+        if prefs is None and settings.use_llm_by_default and self.groq_client.is_configured():
             try:
-                return await self._groq_parse_preferences(query_text, location_hint)
+                prefs = await self._groq_parse_preferences(query_text, location_hint)
+                self._prefs_cache.put(key, prefs)
             except Exception as e:
                 print(f"Groq parse failed: {e}. Falling back to heuristic parsing.")
-        
-        return self._heuristic_parse_preferences(query_text, location_hint)
+
+        if prefs is None:
+            # May query the distinct locations when that cache is cold
+            return await asyncio.to_thread(self._heuristic_parse_preferences, query_text, location_hint)
+        return replace(prefs, query_text=query_text, cuisines=list(prefs.cuisines))
 
     async def _groq_parse_preferences(
         self,
@@ -56,13 +233,10 @@ class LLMOrchestrator:
             {"role": "user", "content": user_prompt}
         ]
         
-        response_text = self.groq_client.chat(messages).strip()
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-
-        data = json.loads(response_text)
+        # Blocking HTTP call; a worker thread keeps the event loop serving
+        # other requests and the speculative candidate fetch meanwhile
+        response_text = await asyncio.to_thread(self.groq_client.chat, messages)
+        data = orjson.loads(_extract_json(response_text))
         
         return UserPreferences(
             query_text=query_text,
@@ -91,31 +265,23 @@ class LLMOrchestrator:
         # We try to find if any known location is mentioned in the query
         detected_location = location_hint
         if not detected_location:
-            from phase4_retrieval.retrieval import get_distinct_locations, get_engine
-            # Note: In a production environment, you would cache this list
             try:
-                known_locations = get_distinct_locations(get_engine())
-                for loc in known_locations:
-                    if loc.lower() in lowered:
-                        detected_location = loc
-                        break
+                detected_location = _detect_location(lowered)
             except Exception:
                 pass
 
+        # All keyword hints in a single sweep over the query
+        hits = _keyword_hits(_KEYWORD_RE, lowered)
+
         # Cuisines (Heuristic)
-        cuisines = []
-        common_cuisines = ["north indian", "south indian", "chinese", "italian", "thai", "asian", "cafe", "desserts", "continental", "mexican", "pizza", "burger", "biryani"]
-        for word in common_cuisines:
-            if word in lowered:
-                cuisines.append(word)
+        cuisines = [word for word in _COMMON_CUISINES if word in hits]
 
         # Price Hints
         min_price_for_two: Optional[int] = None
         max_price_for_two: Optional[int] = None
         
         # Check for range format like "1000-1500" or "1000 to 1500"
-        import re
-        price_ranges = re.findall(r"(\d{3,})\s*(?:-|to|and)\s*(\d{3,})", lowered)
+        price_ranges = _PRICE_RANGE_RE.findall(lowered)
         if price_ranges:
             try:
                 p1, p2 = map(int, price_ranges[0])
@@ -125,34 +291,33 @@ class LLMOrchestrator:
                 pass
         
         # Check for "under 1500" or "below 500"
-        under_price = re.findall(r"(?:under|below|less than|up to)\s*(?:₹|rs\.?)?\s*(\d{3,})", lowered)
+        under_price = _PRICE_UNDER_RE.findall(lowered)
         if under_price and not max_price_for_two:
             max_price_for_two = int(under_price[0])
 
         if not max_price_for_two:
-            if "cheap" in lowered or "budget" in lowered or "low cost" in lowered:
+            if hits.intersection(_CHEAP_WORDS):
                 max_price_for_two = 500
-            elif "mid range" in lowered or "reasonable" in lowered:
+            elif hits.intersection(_MID_RANGE_WORDS):
                 max_price_for_two = 1500
-            elif "expensive" in lowered or "fine dining" in lowered:
+            elif hits.intersection(_EXPENSIVE_WORDS):
                 max_price_for_two = 3000
 
         # Rating Hints
-        import re
         min_rating = None
         max_rating = None
 
         # 1. Check for range format like "4-5" or "4 to 5" specifically for ratings (single digits or X.Y)
         # This is high priority if followed by "star" or "rating"
-        rating_range_matches = re.findall(r"\b([0-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([0-5](?:\.[0-9])?)\s*(?:star|rating)", lowered)
+        rating_range_matches = _RATING_RANGE_SUFFIX_RE.findall(lowered)
         
         # 2. Check for "rating between/from X and Y"
         if not rating_range_matches:
-            rating_range_matches = re.findall(r"rating(?:s)?\s*(?:between|from)?\s*([1-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([1-5](?:\.[0-9])?)", lowered)
+            rating_range_matches = _RATING_RANGE_PREFIX_RE.findall(lowered)
 
         # 3. Check for specific range format like "between 4 and 5" even without "rating" keyword
         if not rating_range_matches:
-            rating_range_matches = re.findall(r"between\s*([1-5](?:\.[0-9])?)\s*(?:-|to|and)\s*([1-5](?:\.[0-9])?)", lowered)
+            rating_range_matches = _BETWEEN_RANGE_RE.findall(lowered)
 
         if rating_range_matches:
             r1, r2 = map(float, rating_range_matches[0])
@@ -160,7 +325,7 @@ class LLMOrchestrator:
             max_rating = max(r1, r2)
         else:
             # 4. Use word boundaries and limit range to 1.0-5.0 to avoid picking up parts of prices like 1000
-            rating_tokens = re.findall(r"\b([1-5](?:\.[0-9])?)\b", lowered)
+            rating_tokens = _RATING_TOKEN_RE.findall(lowered)
             ratings = [float(t) for t in rating_tokens]
             
             if len(ratings) >= 2:
@@ -173,9 +338,9 @@ class LLMOrchestrator:
 
 
 
-        wants_online_order = True if any(x in lowered for x in ["delivery", "online order", "zomato"]) else None
-        wants_table_booking = True if any(x in lowered for x in ["date", "table booking", "book", "reserve"]) else None
-        wants_buffet = True if any(x in lowered for x in ["buffet", "unlimited", "all you can eat"]) else None
+        wants_online_order = True if hits.intersection(_ONLINE_ORDER_WORDS) else None
+        wants_table_booking = True if hits.intersection(_TABLE_BOOKING_WORDS) else None
+        wants_buffet = True if hits.intersection(_BUFFET_WORDS) else None
 
         return UserPreferences(
             query_text=query_text,
@@ -198,8 +363,9 @@ class LLMOrchestrator:
     ) -> List[LLMRecommendation]:
         """
         Re-rank candidates using either Groq or deterministic local fallback.
+        A single candidate has nothing to rank, so it never costs an LLM call.
         """
-        if settings.use_llm_by_default and self.groq_client.is_configured():
+        if len(candidates) > 1 and settings.use_llm_by_default and self.groq_client.is_configured():
             try:
                 return await self._groq_rerank(prefs, candidates)
             except Exception as e:
@@ -215,21 +381,28 @@ class LLMOrchestrator:
     ) -> List[LLMRecommendation]:
         """
         Delegate ranking and explanation to Groq LLM.
+
+        Only the first `max_llm_candidates` are sent to Groq, in one prompt so
+        their scores are comparable; any others are ranked locally and
+        appended after them. The HTTP call runs in a worker thread to keep
+        the event loop free.
         """
-        candidate_data = [
-            {
-                "id": c.id,
-                "name": c.name,
-                "location": c.location,
-                "cuisines": c.cuisines,
-                "rating": c.rating,
-                "votes": c.votes,
-                "approx_cost_for_two": c.approx_cost_for_two,
-                "has_buffet": c.has_buffet,
-            }
-            for c in candidates
-        ]
-        
+        cap = max(settings.max_llm_candidates, 1)
+        overflow = self._fallback_rerank(prefs, candidates[cap:])
+        recs = await asyncio.to_thread(self._groq_rerank_sync, prefs, candidates[:cap])
+        return recs + overflow
+
+    def _groq_rerank_sync(
+        self,
+        prefs: UserPreferences,
+        candidates: List[CandidateRestaurant],
+    ) -> List[LLMRecommendation]:
+        """
+        Rank candidates with a single, blocking Groq prompt.
+        """
+        candidate_data = [_llm_projection(_LLM_CANDIDATE_FIELDS, _llm_candidate_values(c)) for c in candidates]
+        pref_data = _llm_projection(_LLM_PREF_FIELDS, _llm_pref_values(prefs))
+
         system_prompt = (
             "You are an expert restaurant recommendation assistant. "
             "Given candidate restaurants and user preferences, RANK them from best to worst. "
@@ -239,8 +412,8 @@ class LLMOrchestrator:
         
         user_prompt = f"""
         User Query: {prefs.query_text}
-        Preferences: {json.dumps(prefs.__dict__, default=str)}
-        Candidates: {json.dumps(candidate_data)}
+        Preferences: {orjson.dumps(pref_data).decode()}
+        Candidates: {orjson.dumps(candidate_data).decode()}
         """
         
         messages = [
@@ -249,16 +422,9 @@ class LLMOrchestrator:
         ]
         
         response_text = self.groq_client.chat(messages)
-        
-        # Clean response
-        response_text = response_text.strip()
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-            
+
         try:
-            results = json.loads(response_text)
+            results = orjson.loads(_extract_json(response_text))
             recs = [
                 LLMRecommendation(
                     restaurant_id=item["restaurant_id"],
@@ -280,33 +446,50 @@ class LLMOrchestrator:
         """
         Deterministic local scoring logic.
         """
-        scored: List[LLMRecommendation] = []
-        max_votes = max((c.votes for c in candidates), default=1)
-
-        for c in candidates:
-            rating = c.rating or 0.0
-            votes = c.votes or 0
-            base_score = rating * 2.0 + (votes / max_votes)
-
-            # Simple Match Bonuses
-            bonus = 0.0
-            if prefs.cuisines and any(cu.lower() in [x.lower() for x in c.cuisines] for cu in prefs.cuisines):
-                bonus += 1.0
-            if prefs.min_rating and rating >= prefs.min_rating:
-                bonus += 0.5
-            
-            score = base_score + bonus
-            reason = self._build_reason(prefs, c)
-            scored.append(LLMRecommendation(restaurant_id=c.id, score=score, reason=reason))
+        if not candidates:
+            return []
+
+        ratings = np.fromiter((c.rating or 0.0 for c in candidates), dtype=np.float64, count=len(candidates))
+        votes = np.fromiter((c.votes or 0 for c in candidates), dtype=np.float64, count=len(candidates))
+        max_votes = votes.max() or 1.0
+        base_scores = ratings * 2.0 + votes / max_votes
+
+        # Simple Match Bonuses
+        pref_cuisines = frozenset(cu.lower() for cu in prefs.cuisines)
+        cuisine_mask = np.fromiter(
+            (not pref_cuisines.isdisjoint(c.cuisines_lower) for c in candidates),
+            dtype=bool,
+            count=len(candidates),
+        )
+        bonus = cuisine_mask.astype(np.float64)
+        if prefs.min_rating:
+            bonus += 0.5 * (ratings >= prefs.min_rating)
 
-        scored.sort(key=lambda x: x.score, reverse=True)
-        return scored
+        scores = base_scores + bonus
 
-    def _build_reason(self, prefs: UserPreferences, c: CandidateRestaurant) -> str:
+        # Stable descending order, matching list.sort(reverse=True) on ties
+        order = np.argsort(-scores, kind="stable")
+        return [
+            LLMRecommendation(
+                restaurant_id=candidates[i].id,
+                score=float(scores[i]),
+                reason=self._build_reason(prefs, candidates[i], bool(cuisine_mask[i])),
+            )
+            for i in order
+        ]
+
+    def _build_reason(
+        self,
+        prefs: UserPreferences,
+        c: CandidateRestaurant,
+        cuisine_match: Optional[bool] = None,
+    ) -> str:
         parts = []
         if c.rating: parts.append(f"rated {c.rating}/5")
         if c.approx_cost_for_two: parts.append(f"₹{c.approx_cost_for_two} for two")
-        if any(cu.lower() in [x.lower() for x in c.cuisines] for cu in prefs.cuisines):
+        if cuisine_match is None:
+            cuisine_match = not c.cuisines_lower.isdisjoint(cu.lower() for cu in prefs.cuisines)
+        if cuisine_match:
             parts.append("matches your cuisine preference")
         
         return f"{c.name} is a great choice, " + "; ".join(parts)
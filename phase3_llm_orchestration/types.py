@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class UserPreferences:
     """
     Structured representation of user preferences as understood by the system.
@@ -22,7 +22,7 @@ class UserPreferences:
     wants_buffet: Optional[bool] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CandidateRestaurant:
     """
     Lightweight view of a restaurant plus key features needed for ranking.
@@ -40,9 +40,14 @@ class CandidateRestaurant:
     is_cafe: Optional[bool] = None
     supports_online_order: Optional[bool] = None
     supports_table_booking: Optional[bool] = None
+    # Lowercased cuisines, computed once for set-based preference matching
+    cuisines_lower: FrozenSet[str] = field(init=False, repr=False, compare=False)
 
+    def __post_init__(self) -> None:
+        self.cuisines_lower = frozenset(c.lower() for c in self.cuisines)
 
-@dataclass
+
+@dataclass(slots=True)
 class LLMRecommendation:
     """
     Final recommendation item returned by the LLM orchestrator.
@@ -11,6 +11,11 @@ class RetrievalSettings:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     _default_db_path = os.path.join(BASE_DIR, "zomato_restaurants.db")
     db_url: str = os.getenv("DB_URL", f"sqlite:///{_default_db_path}")
+    # Connection pool for the shared engine
+    pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    # Seconds a cached location/cuisine list stays valid
+    lookup_cache_ttl: int = int(os.getenv("LOOKUP_CACHE_TTL", "300"))
 
 settings = RetrievalSettings()
 
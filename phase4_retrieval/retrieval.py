@@ -1,53 +1,213 @@
 from __future__ import annotations
 
-from typing import List, Optional
-
-from sqlalchemy import and_, create_engine, select, or_
-from sqlalchemy.orm import Session
-
-from phase1_data_ingestion.models import Restaurant
+import asyncio
+import time
+from itertools import islice
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    and_,
+    column,
+    create_engine,
+    func,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from phase1_data_ingestion.models import Restaurant, add_indexes, split_cuisines
+from phase1_data_ingestion.sqlite_pragmas import apply_sqlite_pragmas
 from phase2_feature_engineering.models import RestaurantFeatures
 from phase3_llm_orchestration.orchestrator import LLMOrchestrator
 from phase3_llm_orchestration.types import CandidateRestaurant, LLMRecommendation, UserPreferences
 from .config import settings
 
 
+# Read-path tuning for SQLite: WAL lets readers run alongside a writer, and a
+# 64MB page cache keeps the hot tables in memory.
+RETRIEVAL_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+}
+
+_engine = None
+
+# Bumped to drop cached location/cuisine lists, e.g. after an ingest
+_CACHE_EPOCH = 0
+
+
 def get_engine():
     """
-    Create a SQLAlchemy engine pointing at the main DB.
+    Return the shared SQLAlchemy engine pointing at the main DB, creating it
+    on first use so the URL is parsed and the pool built only once.
+    """
+    global _engine
+    if _engine is None:
+        url = make_url(settings.db_url)
+        kwargs = {}
+        if url.get_backend_name() == "sqlite":
+            kwargs["connect_args"] = {"check_same_thread": False}
+        # In-memory SQLite ("sqlite://", ":memory:") uses a singleton pool that
+        # takes no sizing arguments
+        if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+            kwargs.update(pool_size=settings.pool_size, max_overflow=settings.max_overflow)
+        # No pool_pre_ping: a local file needs no liveness check per checkout
+        engine = create_engine(url, future=True, **kwargs)
+        _engine = apply_sqlite_pragmas(engine, RETRIEVAL_SQLITE_PRAGMAS)
+    return _engine
+
+
+def invalidate_lookup_caches() -> None:
     """
-    return create_engine(settings.db_url, future=True)
+    Forget cached distinct locations/cuisines; call after the data changes.
+    """
+    global _CACHE_EPOCH
+    _CACHE_EPOCH += 1
+    _cached_locations.cache_clear()
+    _cached_cuisines.cache_clear()
 
 
-def init_schema(engine) -> None:
+def _cache_key() -> Tuple[int, int]:
     """
-    Placeholder for any retrieval-specific schema (e.g. specialized indexes).
-    Currently just ensuring Base is created is handled by phase5_api or ingest.
+    (epoch, TTL bucket) so entries also expire after `lookup_cache_ttl`.
     """
-    pass
+    ttl = max(settings.lookup_cache_ttl, 1)
+    return _CACHE_EPOCH, int(time.monotonic() // ttl)
 
 
-def _build_candidate_from_row(rest: Restaurant, feats: Optional[RestaurantFeatures]) -> CandidateRestaurant:
+# External-content FTS5 index over restaurants.cuisines. The trigram tokenizer
+# keeps the case-insensitive substring semantics of the old LIKE '%..%' filter.
+FTS_TABLE = "restaurants_fts"
+
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "cuisines, content='restaurants', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON restaurants BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, cuisines) VALUES (new.id, new.cuisines);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON restaurants BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, cuisines) VALUES ('delete', old.id, old.cuisines);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF cuisines ON restaurants BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, cuisines) VALUES ('delete', old.id, old.cuisines);
+        INSERT INTO {FTS_TABLE}(rowid, cuisines) VALUES (new.id, new.cuisines);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+# Trigram MATCH needs at least one full trigram; shorter terms use the FTS
+# table's LIKE support instead (a scan of the index, still case-insensitive).
+_FTS_MIN_TERM = 3
+
+_fts_table = table(FTS_TABLE, column("rowid"), column("cuisines"))
+
+
+def init_schema(engine) -> None:
     """
-    Map raw ORM models to the CandidateRestaurant representation.
+    Retrieval-specific schema on top of the Base tables:
+    - declared indexes missing from older databases (e.g. lower(location));
+    - on SQLite, the FTS5 cuisine index and the triggers that keep it in sync.
+    Idempotent. Each step is skipped if the database rejects it (e.g. a
+    read-only file): queries work without the indexes, and without FTS5
+    retrieval falls back to ILIKE filters.
     """
-    cuisines = []
-    if rest.cuisines:
-        cuisines = [c.strip() for c in rest.cuisines.split(",") if c.strip()]
+    try:
+        add_indexes(engine)
+    except OperationalError as e:
+        print(f"Could not add missing indexes: {e}. Continuing without them.")
+
+    if engine.dialect.name != "sqlite" or _has_fts(engine):
+        return
+    try:
+        with engine.begin() as conn:
+            for ddl in _FTS_DDL:
+                conn.exec_driver_sql(ddl)
+    except OperationalError as e:
+        print(f"Could not create the FTS5 cuisine index: {e}. Using LIKE filters.")
+    finally:
+        _has_fts.cache_clear()
+
 
+@lru_cache(maxsize=8)
+def _has_fts(engine) -> bool:
+    return engine.dialect.name == "sqlite" and inspect(engine).has_table(FTS_TABLE)
+
+
+def _cuisine_condition(engine, cuisines: List[str]):
+    """
+    Match restaurants having any cuisine that contains one of `cuisines`
+    (case-insensitive). On SQLite the FTS index, kept in sync with
+    `restaurants.cuisines` by triggers, is the only filter; other databases,
+    or SQLite builds without FTS5, use ILIKE over the comma-joined string.
+    """
+    if not _has_fts(engine):
+        return or_(*[Restaurant.cuisines.icontains(cuisine) for cuisine in cuisines])
+
+    terms = [c.strip() for c in cuisines]
+    long_terms = [t for t in terms if len(t) >= _FTS_MIN_TERM]
+    short_terms = [t for t in terms if len(t) < _FTS_MIN_TERM]
+    # FTS5 rejects MATCH under an OR with other constraints, so each kind of
+    # term gets its own rowid subquery.
+    conditions = []
+    if long_terms:
+        match_query = " OR ".join('"%s"' % t.replace('"', '""') for t in long_terms)
+        conditions.append(Restaurant.id.in_(
+            select(_fts_table.c.rowid).where(literal_column(FTS_TABLE).op("MATCH")(match_query))
+        ))
+    if short_terms:
+        conditions.append(Restaurant.id.in_(
+            select(_fts_table.c.rowid).where(
+                or_(*[_fts_table.c.cuisines.like(f"%{t}%") for t in short_terms])
+            )
+        ))
+    return or_(*conditions)
+
+
+# Only the columns CandidateRestaurant needs, in _build_candidate_from_row order
+_CANDIDATE_COLUMNS = (
+    Restaurant.id,
+    Restaurant.name,
+    Restaurant.location,
+    Restaurant.cuisines,
+    Restaurant.rating,
+    Restaurant.votes,
+    Restaurant.approx_cost_for_two,
+    Restaurant.online_order,
+    Restaurant.book_table,
+    RestaurantFeatures.popularity_score,
+    RestaurantFeatures.has_buffet,
+    RestaurantFeatures.is_cafe,
+)
+
+
+def _build_candidate_from_row(row) -> CandidateRestaurant:
+    """
+    Map a row of `_CANDIDATE_COLUMNS` to the CandidateRestaurant representation.
+    """
+    (
+        rest_id, name, location, cuisines_text, rating, votes, cost,
+        online_order, book_table, popularity_score, has_buffet, is_cafe,
+    ) = row
     return CandidateRestaurant(
-        id=rest.id,
-        name=rest.name,
-        location=rest.location,
-        cuisines=cuisines,
-        rating=rest.rating,
-        votes=rest.votes or 0,
-        approx_cost_for_two=rest.approx_cost_for_two,
-        popularity_score=feats.popularity_score if feats else None,
-        has_buffet=feats.has_buffet if feats else None,
-        is_cafe=feats.is_cafe if feats else None,
-        supports_online_order=rest.online_order,
-        supports_table_booking=rest.book_table,
+        id=rest_id,
+        name=name,
+        location=location,
+        cuisines=list(split_cuisines(cuisines_text)),
+        rating=rating,
+        votes=votes or 0,
+        approx_cost_for_two=cost,
+        popularity_score=popularity_score,
+        has_buffet=has_buffet,
+        is_cafe=is_cafe,
+        supports_online_order=online_order,
+        supports_table_booking=book_table,
     )
 
 
@@ -65,9 +225,22 @@ def search_candidates(
         engine = get_engine()
 
     candidates: List[CandidateRestaurant] = []
-    with Session(engine) as session:
-        stmt = (
-            select(Restaurant, RestaurantFeatures)
+    with engine.connect() as conn:
+        # Baseline ordering by feature popularity, then rating and votes
+        ordering = (
+            RestaurantFeatures.popularity_score.desc().nullslast(),
+            Restaurant.rating.desc().nullslast(),
+            Restaurant.votes.desc(),
+        )
+
+        # Deduplicate by (name, location): rank the filtered rows within each
+        # group and keep only the best one
+        dedup_rank = func.row_number().over(
+            partition_by=(Restaurant.name, Restaurant.location),
+            order_by=ordering,
+        ).label("dedup_rank")
+        ranked = (
+            select(Restaurant.id.label("id"), dedup_rank)
             .join(
                 RestaurantFeatures,
                 Restaurant.id == RestaurantFeatures.restaurant_id,
@@ -77,14 +250,10 @@ def search_candidates(
 
         conditions = []
         if prefs.location:
-            from sqlalchemy import func
             conditions.append(func.lower(Restaurant.location) == prefs.location.lower())
             
         if prefs.cuisines:
-            cuisine_filters = [
-                Restaurant.cuisines.icontains(cuisine) for cuisine in prefs.cuisines
-            ]
-            conditions.append(or_(*cuisine_filters))
+            conditions.append(_cuisine_condition(engine, prefs.cuisines))
             
         if prefs.min_rating is not None:
             conditions.append(Restaurant.rating >= prefs.min_rating)
@@ -104,68 +273,98 @@ def search_candidates(
             conditions.append(RestaurantFeatures.has_buffet.is_(True))
 
         if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        # Deduplicate by grouping by name and location
-        stmt = stmt.group_by(Restaurant.name, Restaurant.location)
+            ranked = ranked.where(and_(*conditions))
+        ranked = ranked.subquery()
 
-        # Baseline ordering by feature popularity, then rating and votes
-        stmt = stmt.order_by(
-            RestaurantFeatures.popularity_score.desc().nullslast(),
-            Restaurant.rating.desc().nullslast(),
-            Restaurant.votes.desc(),
-        ).limit(limit)
+        stmt = (
+            select(*_CANDIDATE_COLUMNS)
+            .select_from(Restaurant)
+            .join(ranked, Restaurant.id == ranked.c.id)
+            .join(
+                RestaurantFeatures,
+                Restaurant.id == RestaurantFeatures.restaurant_id,
+                isouter=True,
+            )
+            .where(ranked.c.dedup_rank == 1)
+            .order_by(*ordering)
+            .limit(limit)
+        )
 
-        results = session.execute(stmt).all()
-        for rest, feats in results:
-            candidates.append(_build_candidate_from_row(rest, feats))
+        results = conn.execute(stmt).all()
+        candidates = [_build_candidate_from_row(row) for row in results]
 
     return candidates
 
 
+@lru_cache(maxsize=8)
+def _cached_locations(engine, key: Tuple[int, int]) -> Tuple[str, ...]:
+    with engine.connect() as conn:
+        stmt = select(Restaurant.location).distinct().order_by(Restaurant.location)
+        results = conn.execute(stmt).scalars().all()
+        return tuple(loc for loc in results if loc)
+
+
+@lru_cache(maxsize=8)
+def _cached_cuisines(engine, key: Tuple[int, int]) -> Tuple[str, ...]:
+    with engine.connect() as conn:
+        stmt = select(Restaurant.cuisines).distinct()
+        results = conn.execute(stmt).scalars().all()
+        all_cuisines = {c for c_str in results for c in split_cuisines(c_str)}
+        return tuple(sorted(all_cuisines))
+
+
 def get_distinct_locations(engine=None) -> List[str]:
     """
     Fetch all unique location names currently in the database.
+    Cached per engine; see `invalidate_lookup_caches`.
     """
     if engine is None:
         engine = get_engine()
-
-    with Session(engine) as session:
-        stmt = select(Restaurant.location).distinct().order_by(Restaurant.location)
-        results = session.execute(stmt).scalars().all()
-        return [loc for loc in results if loc]
+    return list(_cached_locations(engine, _cache_key()))
 
 
 def get_distinct_cuisines(engine=None) -> List[str]:
     """
     Fetch all unique cuisines currently in the database.
+    Cached per engine; see `invalidate_lookup_caches`.
     """
     if engine is None:
         engine = get_engine()
+    return list(_cached_cuisines(engine, _cache_key()))
 
-    with Session(engine) as session:
-        stmt = select(Restaurant.cuisines).distinct()
-        results = session.execute(stmt).scalars().all()
-        
-        all_cuisines = set()
-        for c_str in results:
-            if c_str:
-                for c in c_str.split(","):
-                    all_cuisines.add(c.strip())
-        
-        return sorted(list(all_cuisines))
 
+def same_hard_filters(a: UserPreferences, b: UserPreferences) -> bool:
+    """
+    True when two preference sets would select the same candidates, i.e.
+    they differ at most in their free-form query text.
+    """
+    return (
+        (a.location or "").lower() == (b.location or "").lower()
+        and sorted(c.lower() for c in a.cuisines) == sorted(c.lower() for c in b.cuisines)
+        and a.min_rating == b.min_rating
+        and a.max_rating == b.max_rating
+        and a.min_price_for_two == b.min_price_for_two
+        and a.max_price_for_two == b.max_price_for_two
+        and bool(a.wants_online_order) == bool(b.wants_online_order)
+        and bool(a.wants_table_booking) == bool(b.wants_table_booking)
+        and bool(a.wants_buffet) == bool(b.wants_buffet)
+    )
 
-async def get_recommendations(
+
+async def get_recommendations_with_details(
     prefs: UserPreferences,
     limit: int = 10,
     engine=None,
     orchestrator: Optional[LLMOrchestrator] = None,
-) -> List[LLMRecommendation]:
+    candidates: Optional[List[CandidateRestaurant]] = None,
+) -> List[Tuple[LLMRecommendation, CandidateRestaurant]]:
     """
     High-level helper:
-    - Fetch candidates via hard filters.
+    - Fetch candidates via hard filters (unless pre-fetched `candidates`
+      for the same filters are passed in).
     - Ask Phase 3 orchestrator to re-rank and generate reasons.
+    Each ranked recommendation is paired with its candidate, which already
+    carries the display fields, so callers need no second query.
     """
     if engine is None:
         engine = get_engine()
@@ -173,19 +372,42 @@ async def get_recommendations(
     if orchestrator is None:
         orchestrator = LLMOrchestrator()
 
-    candidates = search_candidates(prefs, limit=limit, engine=engine)
+    if candidates is None:
+        # Blocking DB I/O runs on a worker thread, off the event loop
+        candidates = await asyncio.to_thread(search_candidates, prefs, limit, engine)
     if not candidates:
         return []
 
     recs = await orchestrator.rerank_candidates(prefs, candidates)
-    return recs[:limit]
+    # The LLM may echo ids that were not offered; those are dropped here
+    cand_by_id = {c.id: c for c in candidates}
+    pairs = ((r, cand_by_id.get(r.restaurant_id)) for r in recs)
+    return list(islice(((r, c) for r, c in pairs if c is not None), limit))
+
+
+async def get_recommendations(
+    prefs: UserPreferences,
+    limit: int = 10,
+    engine=None,
+    orchestrator: Optional[LLMOrchestrator] = None,
+    candidates: Optional[List[CandidateRestaurant]] = None,
+) -> List[LLMRecommendation]:
+    """
+    Ranked recommendations (id + score + reason) only; see
+    `get_recommendations_with_details`.
+    """
+    pairs = await get_recommendations_with_details(prefs, limit, engine, orchestrator, candidates)
+    return [rec for rec, _ in pairs]
 
 
 __all__ = [
     "search_candidates", 
     "get_recommendations", 
+    "get_recommendations_with_details",
     "get_engine", 
     "init_schema", 
     "get_distinct_locations", 
-    "get_distinct_cuisines"
+    "get_distinct_cuisines",
+    "invalidate_lookup_caches",
+    "same_hard_filters",
 ]
@@ -1,22 +1,29 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+import logging
 import os
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+import orjson
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
 
-from phase1_data_ingestion.models import Restaurant, Base
+from phase1_data_ingestion.models import Base
 from phase3_llm_orchestration.orchestrator import LLMOrchestrator
-from phase3_llm_orchestration.types import UserPreferences
+from phase3_llm_orchestration.types import CandidateRestaurant, UserPreferences
 from phase4_retrieval.retrieval import (
     get_engine as get_retrieval_engine,
-    get_recommendations,
+    get_recommendations_with_details,
     init_schema,
     get_distinct_locations,
     get_distinct_cuisines,
+    same_hard_filters,
+    search_candidates,
 )
 from .schemas import (
     RecommendationRequest,
@@ -25,7 +32,24 @@ from .schemas import (
     HealthResponse,
 )
 
-app = FastAPI(title="AI Restaurant Recommendation Service")
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ensure DB schema is present and warm the lookup caches before the first
+    request, so no request pays for schema checks or cold DISTINCT scans.
+    """
+    engine = get_retrieval_engine()
+    Base.metadata.create_all(bind=engine)
+    init_schema(engine)
+    get_distinct_locations(engine)
+    get_distinct_cuisines(engine)
+    yield
+
+
+app = FastAPI(title="AI Restaurant Recommendation Service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,21 +63,17 @@ app.add_middleware(
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
-@app.get("/", response_class=HTMLResponse)
-async def read_index(request: Request):
-    index_path = os.path.join(frontend_path, "index.html")
-    with open(index_path, "r") as f:
-        return f.read()
+index_path = os.path.join(frontend_path, "index.html")
 
 
-@app.on_event("startup")
-def on_startup() -> None:
-    """
-    Ensure DB schema is present on startup.
-    """
-    engine = get_retrieval_engine()
-    Base.metadata.create_all(bind=engine)
-    init_schema(engine)
+@app.get("/", response_class=HTMLResponse)
+async def read_index() -> FileResponse:
+    # Streamed by Starlette off the event loop, with ETag/Last-Modified set
+    return FileResponse(
+        index_path,
+        media_type="text/html",
+        headers={"Cache-Control": "public, max-age=300"},
+    )
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -61,32 +81,76 @@ def health() -> HealthResponse:
     return HealthResponse(status="ok")
 
 
+# Lookup lists only change on ingestion; let browsers keep them for a while
+LOOKUP_CACHE_CONTROL = "public, max-age=3600"
+
+
+@lru_cache(maxsize=8)
+def _encode_lookup(items: Tuple[str, ...]) -> Tuple[bytes, str]:
+    """
+    JSON body and strong ETag for a lookup list, computed once per distinct list.
+    """
+    body = orjson.dumps(list(items))
+    return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match uses weak comparison: any listed tag, W/ or not, or "*".
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _lookup_response(request: Request, items: List[str]) -> Response:
+    body, etag = _encode_lookup(tuple(items))
+    headers = {"ETag": etag, "Cache-Control": LOOKUP_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/locations", response_model=List[str])
-def list_locations() -> List[str]:
-    return get_distinct_locations()
+def list_locations(request: Request) -> Response:
+    return _lookup_response(request, get_distinct_locations())
 
 
 @app.get("/cuisines", response_model=List[str])
-def list_cuisines() -> List[str]:
-    return get_distinct_cuisines()
+def list_cuisines(request: Request) -> Response:
+    return _lookup_response(request, get_distinct_cuisines())
 
 
-async def _build_prefs_from_request(body: RecommendationRequest) -> UserPreferences:
+def _is_prompt_mode(body: RecommendationRequest) -> bool:
+    return bool(
+        body.query_text
+        and body.query_text.strip()
+        and body.query_text != "recommend restaurants"
+    )
+
+
+async def _build_prefs_from_request(
+    body: RecommendationRequest,
+    orch: LLMOrchestrator,
+) -> UserPreferences:
     """
     Separate Prompt-based and Filter-based search modes.
     """
     # If a query text is provided, use LLM-based parsing (Prompt Mode)
-    if body.query_text and body.query_text.strip() and body.query_text != "recommend restaurants":
-        orch = LLMOrchestrator()
+    if _is_prompt_mode(body):
         # In Prompt Mode, we only use the location hint if provided, and the LLM-parsed prefs
         base_prefs = await orch.parse_preferences(
             query_text=body.query_text, location_hint=body.location
         )
-        print(f"DEBUG: Using PROMPT mode for query: '{body.query_text}'")
+        logger.debug("Using PROMPT mode for query: %r", body.query_text)
         return base_prefs
 
     # Otherwise, use explicit filters (Filter Mode)
-    print("DEBUG: Using FILTER mode")
+    logger.debug("Using FILTER mode")
     return UserPreferences(
         query_text=body.query_text or "Scouting based on filters",
         location=body.location,
@@ -101,54 +165,63 @@ async def _build_prefs_from_request(body: RecommendationRequest) -> UserPreferen
     )
 
 
+# One orchestrator (and with it one Groq HTTP session) for the whole app
+orchestrator = LLMOrchestrator()
+
+
+def get_orchestrator() -> LLMOrchestrator:
+    return orchestrator
+
+
 @app.post("/recommendations", response_model=RecommendationResponse)
-async def create_recommendations(body: RecommendationRequest) -> RecommendationResponse:
+async def create_recommendations(
+    body: RecommendationRequest,
+    orch: LLMOrchestrator = Depends(get_orchestrator),
+) -> RecommendationResponse:
     """
     Main recommendations endpoint.
     """
-    prefs = await _build_prefs_from_request(body)
-    print(f"DEBUG: Prefs: {prefs}")
     engine = get_retrieval_engine()
 
-    # Get ranked recommendations (id + score + reason)
-    recs = await get_recommendations(
+    candidates: Optional[List[CandidateRestaurant]] = None
+    if _is_prompt_mode(body):
+        # Overlap the LLM parse with a speculative fetch using only the
+        # location hint; it is reused if parsing adds no further filters.
+        speculative_prefs = UserPreferences(query_text=body.query_text, location=body.location)
+        prefs, speculative = await asyncio.gather(
+            _build_prefs_from_request(body, orch),
+            asyncio.to_thread(search_candidates, speculative_prefs, body.limit, engine),
+        )
+        if same_hard_filters(prefs, speculative_prefs):
+            candidates = speculative
+    else:
+        prefs = await _build_prefs_from_request(body, orch)
+    logger.debug("Prefs: %s", prefs)
+
+    # Ranked recommendations paired with their candidate rows, which already
+    # carry every field the response needs
+    ranked = await get_recommendations_with_details(
         prefs,
         limit=body.limit,
         engine=engine,
-        orchestrator=LLMOrchestrator(),
+        orchestrator=orch,
+        candidates=candidates,
     )
-    print(f"DEBUG: Recs found: {len(recs)}")
-
-    if not recs:
-        return RecommendationResponse(recommendations=[])
-
-    # Expand restaurant details for API response
-    items: List[RecommendationItem] = []
-    with Session(engine) as session:
-        ids = [r.restaurant_id for r in recs]
-        q = session.query(Restaurant).filter(Restaurant.id.in_(ids)).all()
-        rest_by_id = {r.id: r for r in q}
-
-    for r in recs:
-        rest = rest_by_id.get(r.restaurant_id)
-        if rest is None:
-            continue
-        cuisines: List[str] = []
-        if rest.cuisines:
-            cuisines = [c.strip() for c in rest.cuisines.split(",") if c.strip()]
-        items.append(
-            RecommendationItem(
-                id=rest.id,
-                name=rest.name,
-                location=rest.location,
-                cuisines=cuisines,
-                rating=rest.rating,
-                approx_cost_for_two=rest.approx_cost_for_two,
-                score=r.score,
-                reason=r.reason,
-            )
+    logger.debug("Recs found: %d", len(ranked))
+
+    items = [
+        RecommendationItem(
+            id=cand.id,
+            name=cand.name,
+            location=cand.location,
+            cuisines=cand.cuisines,
+            rating=cand.rating,
+            approx_cost_for_two=cand.approx_cost_for_two,
+            score=r.score,
+            reason=r.reason,
         )
-
+        for r, cand in ranked
+    ]
     return RecommendationResponse(recommendations=items)
 
 
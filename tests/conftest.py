@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from phase1_data_ingestion.models import Base
+from phase1_data_ingestion.sqlite_pragmas import apply_sqlite_pragmas
+from phase2_feature_engineering.models import RestaurantFeatures  # noqa: F401  (registers the table)
+
+# Test databases are throwaway, so skip journaling and fsyncs entirely.
+TEST_SQLITE_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+}
+
+
+def _static_engine(creator=None):
+    """
+    In-memory SQLite engine holding a single connection (StaticPool), so
+    every session and worker thread (e.g. `asyncio.to_thread`) sees the
+    same database.
+    """
+    kwargs = {"creator": creator} if creator is not None else {}
+    engine = create_engine(
+        "sqlite://",
+        future=True,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+        **kwargs,
+    )
+    return apply_sqlite_pragmas(engine, TEST_SQLITE_PRAGMAS)
+
+
+@pytest.fixture
+def memory_engine():
+    """
+    Fresh, empty in-memory SQLite engine for one test.
+    """
+    engine = _static_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def database_template():
+    """
+    Factory building an in-memory template database: the full schema plus
+    whatever `seed(engine)` inserts. Returns the raw sqlite3 connection,
+    to be copied per test with `clone_database`.
+    """
+    built = []
+
+    def build(seed=None) -> sqlite3.Connection:
+        engine = _static_engine()
+        Base.metadata.create_all(bind=engine)
+        if seed is not None:
+            seed(engine)
+        raw = engine.raw_connection()
+        built.append((engine, raw))
+        return raw.driver_connection
+
+    yield build
+    for engine, raw in built:
+        raw.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def clone_database():
+    """
+    Factory returning a fresh engine over a page-by-page copy of a template
+    database, so tests share setup cost but never each other's writes.
+    """
+    clones = []
+
+    def clone(template: sqlite3.Connection):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        template.backup(conn)
+        engine = _static_engine(creator=lambda: conn)
+        clones.append((engine, conn))
+        return engine
+
+    yield clone
+    for engine, conn in clones:
+        engine.dispose()
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def _schema_template(database_template):
+    return database_template()
+
+
+@pytest.fixture
+def schema_engine(_schema_template, clone_database):
+    """
+    In-memory SQLite engine for one test with all tables already created,
+    copied from the session template instead of rerunning DDL.
+    """
+    return clone_database(_schema_template)
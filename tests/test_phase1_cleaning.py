@@ -1,12 +1,16 @@
 import math
 
+import pandas as pd
+
 from phase1_data_ingestion.cleaning import (
     parse_rating,
     parse_cost_for_two,
     normalize_bool,
     normalize_cuisines,
     clean_record,
+    clean_batch,
 )
+from phase1_data_ingestion.models import split_cuisines
 
 
 def test_parse_rating_valid_and_invalid():
@@ -42,6 +46,12 @@ def test_normalize_cuisines_deduplicates_and_trims():
     assert value == "North Indian, Chinese"
 
 
+def test_split_cuisines_splits_and_trims():
+    assert split_cuisines(None) == ()
+    assert split_cuisines(" , ") == ()
+    assert split_cuisines("North Indian, Chinese ,, Cafe") == ("North Indian", "Chinese", "Cafe")
+
+
 def test_clean_record_maps_fields_and_parses_values():
     raw = {
         "name": "Test Restaurant",
@@ -75,3 +85,25 @@ def test_clean_record_maps_fields_and_parses_values():
     assert cleaned["approx_cost_for_two"] == 1000
     assert cleaned["cuisines"] == "North Indian, Chinese"
 
+
+
+def test_clean_batch_matches_clean_record():
+    rows = [
+        {
+            "name": " Test Restaurant ",
+            "url": "",
+            "location": "Banashankari",
+            "online_order": "Yes",
+            "book_table": "maybe",
+            "rate": "4.2/5",
+            "votes": 100,
+            "approx_cost(for two people)": "1,000",
+            "cuisines": "North Indian, Chinese, north indian",
+        },
+        {"name": "", "rate": "4.0/5"},
+        {"name": "No Rating", "rate": "NEW", "votes": "", "approx_cost(for two people)": None},
+    ]
+
+    cleaned = clean_batch(pd.DataFrame(rows)).to_dict("records")
+    expected = [clean_record(row) for row in rows if clean_record(row)["name"]]
+    assert cleaned == expected
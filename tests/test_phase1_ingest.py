@@ -1,18 +1,18 @@
 from typing import Dict, Any, List
 
-from sqlalchemy import create_engine, select, inspect
+import pytest
+
+from sqlalchemy import create_engine, select, inspect, text
 from sqlalchemy.orm import Session
 
 from phase1_data_ingestion.ingest import (
     init_db,
     iter_clean_restaurants,
     bulk_insert_restaurants,
+    prefetch,
 )
-from phase1_data_ingestion.models import Base, Restaurant
-
-
-def _make_in_memory_engine():
-    return create_engine("sqlite:///:memory:", future=True)
+from phase1_data_ingestion.models import Restaurant
+from phase1_data_ingestion.sqlite_pragmas import apply_sqlite_pragmas
 
 
 def test_iter_clean_restaurants_skips_missing_name():
@@ -25,9 +25,8 @@ def test_iter_clean_restaurants_skips_missing_name():
     assert restaurants[0].name == "Valid"
 
 
-def test_bulk_insert_restaurants_inserts_into_db():
-    engine = _make_in_memory_engine()
-    Base.metadata.create_all(bind=engine)
+def test_bulk_insert_restaurants_inserts_into_db(schema_engine):
+    engine = schema_engine
 
     rows: List[Dict[str, Any]] = [
         {
@@ -64,8 +63,8 @@ def test_bulk_insert_restaurants_inserts_into_db():
         assert result[0].approx_cost_for_two == 500
 
 
-def test_init_db_creates_tables():
-    engine = _make_in_memory_engine()
+def test_init_db_creates_tables(memory_engine):
+    engine = memory_engine
     # Before calling init_db, tables should not exist
     inspector = inspect(engine)
     assert "restaurants" not in inspector.get_table_names()
@@ -73,4 +72,49 @@ def test_init_db_creates_tables():
     init_db(engine)
     inspector = inspect(engine)
     assert "restaurants" in inspector.get_table_names()
+    index_names = {ix["name"] for ix in inspector.get_indexes("restaurants")}
+    assert {
+        "ix_restaurants_listed_in_city",
+        "ix_restaurants_location",
+        "ix_restaurants_rating",
+        "ix_restaurants_cost_for_two",
+    } <= index_names
+
+
+def test_init_db_backfills_expression_index_on_existing_table(memory_engine):
+    engine = memory_engine
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE restaurants (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+                          "location VARCHAR(255), listed_in_city VARCHAR(255), rating FLOAT, "
+                          "approx_cost_for_two INTEGER)"))
+
+    init_db(engine)
+    init_db(engine)  # idempotent
+
+    with engine.connect() as conn:
+        names = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'restaurants'")
+        ).scalars().all()
+    assert "ix_restaurants_location_lower_rating" in names
+
+
+def test_prefetch_preserves_order_and_propagates_errors():
+    assert list(prefetch(range(50), buffer=3)) == list(range(50))
+
+    def failing():
+        yield 1
+        raise ValueError("stream broke")
+
+    it = prefetch(failing())
+    assert next(it) == 1
+    with pytest.raises(ValueError):
+        next(it)
+
 
+def test_apply_sqlite_pragmas_runs_on_connect():
+    engine = apply_sqlite_pragmas(
+        create_engine("sqlite://", future=True), {"temp_store": "MEMORY", "cache_size": -1000}
+    )
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA temp_store")).scalar() == 2
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -1000
@@ -1,13 +1,18 @@
 from typing import List
 
-from sqlalchemy import create_engine, select
+import numpy as np
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from phase1_data_ingestion.models import Base, Restaurant
+from phase1_data_ingestion.models import Restaurant
 from phase2_feature_engineering.embedding import (
     compute_embedding,
+    compute_embeddings_batch,
     vector_to_string,
     string_to_vector,
+    vector_to_bytes,
+    bytes_to_vector,
 )
 from phase2_feature_engineering.features import (
     compute_price_bucket,
@@ -21,10 +26,6 @@ from phase2_feature_engineering.features import (
 from phase2_feature_engineering.models import RestaurantFeatures
 
 
-def _make_in_memory_engine():
-    return create_engine("sqlite:///:memory:", future=True)
-
-
 def test_price_bucket_rules():
     assert compute_price_bucket(None) is None
     assert compute_price_bucket(300) == 1  # low
@@ -76,6 +77,25 @@ def test_embedding_roundtrip_and_determinism():
         assert abs(a - b) < 1e-5
 
 
+def test_embedding_bytes_roundtrip_is_float32():
+    vec = compute_embedding("some search text", dim=8)
+    blob = vector_to_bytes(vec)
+    assert len(blob) == 8 * 4
+    restored = bytes_to_vector(blob)
+    assert restored.dtype == np.float32
+    assert np.allclose(restored, vec, atol=1e-7)
+    # Legacy rows stored comma-separated text
+    assert np.allclose(bytes_to_vector(vector_to_string(vec)), vec, atol=1e-5)
+
+
+def test_embeddings_batch_matches_single_embedding():
+    texts = ["some search text", "", "another | text"]
+    batch = compute_embeddings_batch(texts, dim=24)
+    assert batch.shape == (3, 24)
+    for text, row in zip(texts, batch):
+        assert row.tolist() == compute_embedding(text, dim=24)
+
+
 def test_build_features_for_restaurant_populates_fields():
     rest = Restaurant(
         id=1,
@@ -104,11 +124,9 @@ def test_build_features_for_restaurant_populates_fields():
     assert features.embedding
 
 
-def test_generate_features_for_all_creates_feature_rows():
-    engine = _make_in_memory_engine()
-    # Create schema
-    Base.metadata.create_all(bind=engine)
-    init_feature_schema(engine)
+def test_generate_features_for_all_creates_feature_rows(schema_engine):
+    engine = schema_engine
+    init_feature_schema(engine)  # idempotent on an existing schema
 
     # Insert some restaurants
     with Session(engine) as session:
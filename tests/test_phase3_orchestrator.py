@@ -1,5 +1,10 @@
+import asyncio
+import json
+import threading
+
+from phase3_llm_orchestration import orchestrator as orchestrator_module
 from phase3_llm_orchestration.orchestrator import LLMOrchestrator
-from phase3_llm_orchestration.types import CandidateRestaurant
+from phase3_llm_orchestration.types import CandidateRestaurant, UserPreferences
 
 
 def test_parse_preferences_basic_extraction():
@@ -63,3 +68,227 @@ def test_rerank_candidates_prefers_higher_score_and_generates_reason():
     assert "rated" in results[0].reason
     assert "Banashankari" in results[0].reason
 
+
+
+class _EchoGroqClient:
+    """Stub client that scores each candidate in the prompt by its id."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def is_configured(self):
+        return True
+
+    def chat(self, messages, max_tokens=512):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        candidates = json.loads(prompt.split("Candidates:", 1)[1].strip())
+        return json.dumps(
+            [{"restaurant_id": c["id"], "score": c["id"], "reason": c["name"]} for c in candidates]
+        )
+
+
+def test_groq_rerank_calls_groq_off_the_event_loop_thread():
+    client = _EchoGroqClient()
+    threads = []
+    chat = client.chat
+
+    def recording_chat(messages, max_tokens=512):
+        threads.append(threading.get_ident())
+        return chat(messages, max_tokens)
+
+    client.chat = recording_chat
+    orch = LLMOrchestrator(groq_client=client)
+    candidates = [
+        CandidateRestaurant(
+            id=i, name=f"R{i}", location="Banashankari", cuisines=[],
+            rating=4.0, votes=10, approx_cost_for_two=500,
+        )
+        for i in range(1, 4)
+    ]
+
+    recs = asyncio.run(orch._groq_rerank(UserPreferences(query_text="q"), candidates))
+
+    assert client.calls == 1
+    assert threads and threads[0] != threading.get_ident()
+    assert [r.restaurant_id for r in recs] == [3, 2, 1]
+
+
+def test_heuristic_parse_matches_overlapping_keywords():
+    orch = LLMOrchestrator()
+    prefs = orch._heuristic_parse_preferences(
+        "cheap south indian and chinese buffet, table booking for a date",
+        location_hint="Banashankari",
+    )
+
+    assert prefs.cuisines == ["south indian", "chinese"]
+    assert prefs.max_price_for_two == 500
+    assert prefs.wants_buffet is True
+    assert prefs.wants_table_booking is True
+    assert prefs.wants_online_order is None
+
+
+def test_heuristic_parse_reads_locations_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def recording_locations():
+        threads.append(threading.get_ident())
+        return ["Banashankari"]
+
+    monkeypatch.setattr("phase4_retrieval.retrieval.get_distinct_locations", recording_locations)
+    orch = LLMOrchestrator()
+
+    prefs = asyncio.run(orch.parse_preferences("cheap chinese in banashankari"))
+
+    assert prefs.location == "Banashankari"
+    assert threads and threads[0] != threading.get_ident()
+
+
+def test_detect_location_prefers_longest_nested_name(monkeypatch):
+    monkeypatch.setattr(
+        "phase4_retrieval.retrieval.get_distinct_locations",
+        lambda: ["BTM", "Koramangala", "Koramangala 5th Block"],
+    )
+    detect = orchestrator_module._detect_location
+
+    assert detect("dinner in koramangala 5th block") == "Koramangala 5th Block"
+    assert detect("cafes around koramangala") == "Koramangala"
+    assert detect("btm or koramangala 5th block") == "BTM"
+    assert detect("somewhere else") is None
+
+
+def test_fallback_rerank_scores_and_orders_candidates():
+    orch = LLMOrchestrator()
+    prefs = UserPreferences(query_text="q", cuisines=["chinese"], min_rating=4.0)
+    candidates = [
+        CandidateRestaurant(id=1, name="A", location="X", cuisines=["Cafe"], rating=4.0, votes=10, approx_cost_for_two=300),
+        CandidateRestaurant(id=2, name="B", location="X", cuisines=["Chinese"], rating=4.0, votes=10, approx_cost_for_two=300),
+        CandidateRestaurant(id=3, name="C", location="X", cuisines=["Cafe"], rating=None, votes=0, approx_cost_for_two=None),
+        CandidateRestaurant(id=4, name="D", location="X", cuisines=["Cafe"], rating=4.0, votes=10, approx_cost_for_two=300),
+    ]
+
+    recs = orch._fallback_rerank(prefs, candidates)
+
+    # Ties keep their input order
+    assert [r.restaurant_id for r in recs] == [2, 1, 4, 3]
+    assert recs[0].score == 4.0 * 2.0 + 1.0 + 1.0 + 0.5
+    assert recs[-1].score == 0.0
+    assert orch._fallback_rerank(prefs, []) == []
+
+
+def test_extract_json_handles_fences_and_surrounding_prose():
+    extract = orchestrator_module._extract_json
+
+    assert extract('```json\n[{"restaurant_id": 1}]\n```') == '[{"restaurant_id": 1}]'
+    assert extract('Here you go:\n```\n{"a": 1}\n```') == '{"a": 1}'
+    assert extract('Ranked: [{"reason": "a ] in \\"text\\""}, {"b": [1]}] hope it helps') == (
+        '[{"reason": "a ] in \\"text\\""}, {"b": [1]}]'
+    )
+
+
+def test_groq_rerank_caps_llm_candidates_and_ranks_rest_locally(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.settings, "max_llm_candidates", 3)
+    client = _EchoGroqClient()
+    orch = LLMOrchestrator(groq_client=client)
+    candidates = [
+        CandidateRestaurant(
+            id=i, name=f"R{i}", location="Banashankari", cuisines=[],
+            rating=4.0, votes=i, approx_cost_for_two=500,
+        )
+        for i in range(1, 6)
+    ]
+
+    recs = asyncio.run(orch._groq_rerank(UserPreferences(query_text="q"), candidates))
+
+    assert client.calls == 1
+    assert [r.restaurant_id for r in recs] == [3, 2, 1, 5, 4]
+
+
+def test_rerank_single_candidate_skips_llm(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.settings, "use_llm_by_default", True)
+    client = _EchoGroqClient()
+    orch = LLMOrchestrator(groq_client=client)
+    candidate = CandidateRestaurant(
+        id=1, name="Only", location="Banashankari", cuisines=[],
+        rating=4.0, votes=1, approx_cost_for_two=500,
+    )
+
+    recs = asyncio.run(orch.rerank_candidates(UserPreferences(query_text="q"), [candidate]))
+
+    assert client.calls == 0
+    assert [r.restaurant_id for r in recs] == [1]
+
+
+class _ParseGroqClient:
+    """Stub client returning a fixed preference JSON, or failing on demand."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def is_configured(self):
+        return True
+
+    def chat(self, messages, max_tokens=512):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("rate limited")
+        return json.dumps({"location": "Banashankari", "cuisines": ["chinese"], "max_price_for_two": 500})
+
+
+def test_parse_preferences_caches_normalized_queries(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.settings, "use_llm_by_default", True)
+    client = _ParseGroqClient()
+    orch = LLMOrchestrator(groq_client=client)
+
+    first = asyncio.run(orch.parse_preferences("Cheap Chinese", location_hint="Banashankari"))
+    first.cuisines.append("thai")
+    second = asyncio.run(orch.parse_preferences("  cheap   chinese! ", location_hint="banashankari"))
+
+    assert client.calls == 1
+    assert second.query_text == "  cheap   chinese! "
+    assert second.cuisines == ["chinese"]
+
+
+def test_parse_preferences_does_not_cache_heuristic_fallback(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.settings, "use_llm_by_default", True)
+    client = _ParseGroqClient()
+    client.fail = True
+    orch = LLMOrchestrator(groq_client=client)
+
+    degraded = asyncio.run(orch.parse_preferences("Cheap Chinese", location_hint="Banashankari"))
+    assert degraded.max_price_for_two is not None  # heuristic still parses the query
+
+    # Once Groq recovers the next call reaches it instead of a pinned fallback
+    client.fail = False
+    asyncio.run(orch.parse_preferences("Cheap Chinese", location_hint="Banashankari"))
+    asyncio.run(orch.parse_preferences("Cheap Chinese", location_hint="Banashankari"))
+    assert client.calls == 2
+
+
+def test_groq_parse_runs_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(orchestrator_module.settings, "use_llm_by_default", True)
+    client = _ParseGroqClient()
+    loop_ran = threading.Event()
+    chat = client.chat
+
+    def chat_waiting_for_loop(messages, max_tokens=512):
+        # Only returns promptly if the loop keeps running other tasks meanwhile
+        assert loop_ran.wait(timeout=2)
+        return chat(messages, max_tokens)
+
+    client.chat = chat_waiting_for_loop
+    orch = LLMOrchestrator(groq_client=client)
+
+    async def other_work():
+        await asyncio.sleep(0)
+        loop_ran.set()
+
+    async def run():
+        prefs, _ = await asyncio.gather(orch.parse_preferences("Cheap Chinese"), other_work())
+        return prefs
+
+    prefs = asyncio.run(run())
+
+    assert client.calls == 1
+    assert prefs.max_price_for_two == 500
@@ -1,112 +1,131 @@
+import sqlite3
+
+import pytest
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
 
-from phase1_data_ingestion.models import Base, Restaurant
+from phase1_data_ingestion.models import Restaurant
+from phase2_feature_engineering.embedding import vector_to_bytes
 from phase2_feature_engineering.models import RestaurantFeatures
 from phase3_llm_orchestration.orchestrator import LLMOrchestrator
 from phase3_llm_orchestration.types import UserPreferences
-from phase4_retrieval.retrieval import search_candidates, get_recommendations
-
-
-def _make_in_memory_engine():
-    return create_engine("sqlite:///:memory:", future=True)
+from phase4_retrieval import retrieval
+from phase4_retrieval.retrieval import (
+    _has_fts,
+    get_distinct_locations,
+    get_recommendations,
+    init_schema,
+    invalidate_lookup_caches,
+    same_hard_filters,
+    search_candidates,
+)
 
 
 def _seed_sample_data(engine):
-    Base.metadata.create_all(bind=engine)
-
-    with Session(engine) as session:
-        # Restaurant 1: strong match
-        r1 = Restaurant(
-            name="Buffet Palace",
-            location="Banashankari",
-            listed_in_city="Banashankari",
-            approx_cost_for_two=600,
-            rating=4.5,
-            votes=200,
-            cuisines="North Indian, Chinese",
-            online_order=True,
-            book_table=True,
+    embedding = vector_to_bytes([0.1, 0.2, 0.3])
+    with engine.begin() as conn:
+        conn.execute(
+            Restaurant.__table__.insert(),
+            [
+                # Restaurant 1: strong match
+                {
+                    "id": 1,
+                    "name": "Buffet Palace",
+                    "location": "Banashankari",
+                    "listed_in_city": "Banashankari",
+                    "approx_cost_for_two": 600,
+                    "rating": 4.5,
+                    "votes": 200,
+                    "cuisines": "North Indian, Chinese",
+                    "online_order": True,
+                    "book_table": True,
+                },
+                # Restaurant 2: weaker match (higher price, lower rating)
+                {
+                    "id": 2,
+                    "name": "Average Diner",
+                    "location": "Banashankari",
+                    "listed_in_city": "Banashankari",
+                    "approx_cost_for_two": 1800,
+                    "rating": 3.2,
+                    "votes": 20,
+                    "cuisines": "North Indian",
+                    "online_order": False,
+                    "book_table": False,
+                },
+                # Restaurant 3: different location
+                {
+                    "id": 3,
+                    "name": "Far Away Cafe",
+                    "location": "Basavanagudi",
+                    "listed_in_city": "Basavanagudi",
+                    "approx_cost_for_two": 500,
+                    "rating": 4.0,
+                    "votes": 50,
+                    "cuisines": "Cafe",
+                    "online_order": True,
+                    "book_table": False,
+                },
+            ],
         )
-
-        # Restaurant 2: weaker match (higher price, lower rating)
-        r2 = Restaurant(
-            name="Average Diner",
-            location="Banashankari",
-            listed_in_city="Banashankari",
-            approx_cost_for_two=1800,
-            rating=3.2,
-            votes=20,
-            cuisines="North Indian",
-            online_order=False,
-            book_table=False,
+        conn.execute(
+            RestaurantFeatures.__table__.insert(),
+            [
+                {
+                    "restaurant_id": 1,
+                    "rating_bucket": 3,
+                    "price_bucket": 2,
+                    "popularity_score": 10.0,
+                    "has_buffet": True,
+                    "is_cafe": False,
+                    "supports_online_order": True,
+                    "supports_table_booking": True,
+                    "search_text": "Buffet Palace Banashankari North Indian buffet",
+                    "embedding": embedding,
+                },
+                {
+                    "restaurant_id": 2,
+                    "rating_bucket": 2,
+                    "price_bucket": 3,
+                    "popularity_score": 3.0,
+                    "has_buffet": False,
+                    "is_cafe": False,
+                    "supports_online_order": False,
+                    "supports_table_booking": False,
+                    "search_text": "Average Diner Banashankari",
+                    "embedding": embedding,
+                },
+                {
+                    "restaurant_id": 3,
+                    "rating_bucket": 3,
+                    "price_bucket": 1,
+                    "popularity_score": 5.0,
+                    "has_buffet": False,
+                    "is_cafe": True,
+                    "supports_online_order": True,
+                    "supports_table_booking": False,
+                    "search_text": "Far Away Cafe Basavanagudi",
+                    "embedding": embedding,
+                },
+            ],
         )
 
-        # Restaurant 3: different location
-        r3 = Restaurant(
-            name="Far Away Cafe",
-            location="Basavanagudi",
-            listed_in_city="Basavanagudi",
-            approx_cost_for_two=500,
-            rating=4.0,
-            votes=50,
-            cuisines="Cafe",
-            online_order=True,
-            book_table=False,
-        )
 
-        session.add_all([r1, r2, r3])
-        session.commit()
+@pytest.fixture(scope="module")
+def _sample_template(database_template):
+    return database_template(_seed_sample_data)
 
-        # Fetch IDs after commit
-        r1_id = r1.id
-        r2_id = r2.id
-        r3_id = r3.id
-
-        f1 = RestaurantFeatures(
-            restaurant_id=r1_id,
-            rating_bucket=3,
-            price_bucket=2,
-            popularity_score=10.0,
-            has_buffet=True,
-            is_cafe=False,
-            supports_online_order=True,
-            supports_table_booking=True,
-            search_text="Buffet Palace Banashankari North Indian buffet",
-            embedding="0.1,0.2,0.3",
-        )
-        f2 = RestaurantFeatures(
-            restaurant_id=r2_id,
-            rating_bucket=2,
-            price_bucket=3,
-            popularity_score=3.0,
-            has_buffet=False,
-            is_cafe=False,
-            supports_online_order=False,
-            supports_table_booking=False,
-            search_text="Average Diner Banashankari",
-            embedding="0.1,0.2,0.3",
-        )
-        f3 = RestaurantFeatures(
-            restaurant_id=r3_id,
-            rating_bucket=3,
-            price_bucket=1,
-            popularity_score=5.0,
-            has_buffet=False,
-            is_cafe=True,
-            supports_online_order=True,
-            supports_table_booking=False,
-            search_text="Far Away Cafe Basavanagudi",
-            embedding="0.1,0.2,0.3",
-        )
 
-        session.add_all([f1, f2, f3])
-        session.commit()
+@pytest.fixture
+def sample_engine(_sample_template, clone_database):
+    """
+    Per-test copy of the sample data, which is seeded once per module.
+    """
+    return clone_database(_sample_template)
 
 
-def test_search_candidates_applies_location_and_price_and_rating_filters():
-    engine = _make_in_memory_engine()
-    _seed_sample_data(engine)
+def test_search_candidates_applies_location_and_price_and_rating_filters(sample_engine):
+    engine = sample_engine
 
     prefs = UserPreferences(
         query_text="cheap north indian buffet in Banashankari rated 4+",
@@ -126,9 +145,8 @@ def test_search_candidates_applies_location_and_price_and_rating_filters():
     assert "North Indian" in candidates[0].cuisines
 
 
-def test_get_recommendations_integration_with_orchestrator():
-    engine = _make_in_memory_engine()
-    _seed_sample_data(engine)
+def test_get_recommendations_integration_with_orchestrator(sample_engine):
+    engine = sample_engine
 
     prefs = UserPreferences(
         query_text="north indian in Banashankari under 1000 with good rating",
@@ -155,3 +173,103 @@ def test_get_recommendations_integration_with_orchestrator():
         ).scalar_one()
         assert top_rest.name == "Buffet Palace"
 
+
+
+def test_same_hard_filters_ignores_query_text_only():
+    base = UserPreferences(query_text="a", location="Banashankari", cuisines=["Chinese"])
+    same = UserPreferences(query_text="b", location="banashankari", cuisines=["chinese"])
+    narrower = UserPreferences(query_text="b", location="Banashankari", cuisines=["Chinese"], min_rating=4.0)
+
+    assert same_hard_filters(base, same)
+    assert not same_hard_filters(base, narrower)
+
+
+def test_distinct_locations_are_cached_until_invalidated(sample_engine):
+    engine = sample_engine
+
+    assert get_distinct_locations(engine) == ["Banashankari", "Basavanagudi"]
+
+    with Session(engine) as session:
+        session.add(Restaurant(name="New Place", location="Jayanagar"))
+        session.commit()
+
+    assert get_distinct_locations(engine) == ["Banashankari", "Basavanagudi"]
+    invalidate_lookup_caches()
+    assert get_distinct_locations(engine) == ["Banashankari", "Basavanagudi", "Jayanagar"]
+
+
+def test_search_candidates_keeps_best_row_per_name_and_location(sample_engine):
+    engine = sample_engine
+
+    with Session(engine) as session:
+        # Same restaurant listed again under another listing type, rated lower
+        session.add(Restaurant(name="Buffet Palace", location="Banashankari", rating=3.0, votes=5))
+        session.commit()
+
+    candidates = search_candidates(UserPreferences(query_text="q", location="Banashankari"), engine=engine)
+
+    palaces = [c for c in candidates if c.name == "Buffet Palace"]
+    assert len(palaces) == 1
+    assert palaces[0].rating == 4.5
+
+
+def test_cuisine_filter_uses_fts_index_after_init_schema(sample_engine):
+    engine = sample_engine
+    init_schema(engine)
+    init_schema(engine)  # idempotent
+
+    with Session(engine) as session:
+        # Indexed by the insert trigger
+        session.add(Restaurant(name="Noodle Bar", location="Jayanagar", cuisines="Chinese, Thai"))
+        session.commit()
+
+    prefs = UserPreferences(query_text="q", cuisines=["chinese"])
+    names = {c.name for c in search_candidates(prefs, engine=engine)}
+
+    assert names == {"Buffet Palace", "Noodle Bar"}
+
+
+def test_cuisine_filter_uses_fts_for_short_and_long_terms(sample_engine):
+    engine = sample_engine
+    init_schema(engine)
+    assert _has_fts(engine)
+
+    with Session(engine) as session:
+        session.add(Restaurant(name="Noodle Bar", location="Jayanagar", cuisines="Chinese, Thai"))
+        session.commit()
+
+    # "ai" is shorter than a trigram and goes through the FTS table's LIKE
+    prefs = UserPreferences(query_text="q", cuisines=["AI", "cafe"])
+    names = {c.name for c in search_candidates(prefs, engine=engine)}
+    assert names == {"Noodle Bar", "Far Away Cafe"}
+
+
+def test_init_schema_tolerates_read_only_database(_sample_template, tmp_path):
+    path = tmp_path / "bundled.db"
+    target = sqlite3.connect(path)
+    _sample_template.backup(target)
+    # Like the bundled database, built before the newer indexes existed
+    target.execute("DROP INDEX ix_restaurants_location_lower_rating")
+    target.close()
+    engine = create_engine(f"sqlite:///file:{path}?mode=ro&uri=true", future=True)
+
+    init_schema(engine)
+
+    assert not _has_fts(engine)
+    prefs = UserPreferences(query_text="q", location="banashankari", cuisines=["chinese"])
+    assert [c.name for c in search_candidates(prefs, engine=engine)] == ["Buffet Palace"]
+    assert get_distinct_locations(engine) == ["Banashankari", "Basavanagudi"]
+    engine.dispose()
+
+
+@pytest.mark.parametrize("db_url", ["sqlite://", "sqlite:///:memory:"])
+def test_get_engine_accepts_in_memory_sqlite_urls(monkeypatch, db_url):
+    monkeypatch.setattr(retrieval.settings, "db_url", db_url)
+    monkeypatch.setattr(retrieval, "_engine", None)
+
+    engine = retrieval.get_engine()
+
+    assert not engine.pool._pre_ping
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT 1").scalar() == 1
+    engine.dispose()
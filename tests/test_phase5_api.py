@@ -1,86 +1,121 @@
+import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
 
-from phase1_data_ingestion.models import Base, Restaurant
+from phase1_data_ingestion.models import Restaurant
+from phase2_feature_engineering.embedding import vector_to_bytes
 from phase2_feature_engineering.models import RestaurantFeatures
 from phase4_retrieval import retrieval as retrieval_module
 from phase5_api.main import app
 
 
-def _make_in_memory_engine():
-    # Use a file-based SQLite to ensure persistence across sessions in the test
-    return create_engine("sqlite:///./test_api.db", future=True)
-
-
 def _seed_sample_data(engine):
-    Base.metadata.create_all(bind=engine)
-
-    with Session(engine) as session:
-        r1 = Restaurant(
-            name="API Buffet Place",
-            location="Banashankari",
-            listed_in_city="Banashankari",
-            approx_cost_for_two=400,
-            rating=4.3,
-            votes=120,
-            cuisines="North Indian, Chinese",
-            online_order=True,
-            book_table=True,
-        )
-        r2 = Restaurant(
-            name="API Average Diner",
-            location="Banashankari",
-            listed_in_city="Banashankari",
-            approx_cost_for_two=1500,
-            rating=3.0,
-            votes=10,
-            cuisines="North Indian",
-            online_order=False,
-            book_table=False,
-        )
-        session.add_all([r1, r2])
-        session.commit()
-
-        f1 = RestaurantFeatures(
-            restaurant_id=r1.id,
-            rating_bucket=3,
-            price_bucket=2,
-            popularity_score=8.0,
-            has_buffet=True,
-            is_cafe=False,
-            supports_online_order=True,
-            supports_table_booking=True,
-            search_text="API Buffet Place Banashankari North Indian buffet",
-            embedding="0.1,0.2,0.3",
+    embedding = vector_to_bytes([0.1, 0.2, 0.3])
+    with engine.begin() as conn:
+        conn.execute(
+            Restaurant.__table__.insert(),
+            [
+                {
+                    "id": 1,
+                    "name": "API Buffet Place",
+                    "location": "Banashankari",
+                    "listed_in_city": "Banashankari",
+                    "approx_cost_for_two": 400,
+                    "rating": 4.3,
+                    "votes": 120,
+                    "cuisines": "North Indian, Chinese",
+                    "online_order": True,
+                    "book_table": True,
+                },
+                {
+                    "id": 2,
+                    "name": "API Average Diner",
+                    "location": "Banashankari",
+                    "listed_in_city": "Banashankari",
+                    "approx_cost_for_two": 1500,
+                    "rating": 3.0,
+                    "votes": 10,
+                    "cuisines": "North Indian",
+                    "online_order": False,
+                    "book_table": False,
+                },
+            ],
         )
-        f2 = RestaurantFeatures(
-            restaurant_id=r2.id,
-            rating_bucket=1,
-            price_bucket=2,
-            popularity_score=2.0,
-            has_buffet=False,
-            is_cafe=False,
-            supports_online_order=False,
-            supports_table_booking=False,
-            search_text="API Average Diner Banashankari",
-            embedding="0.1,0.2,0.3",
+        conn.execute(
+            RestaurantFeatures.__table__.insert(),
+            [
+                {
+                    "restaurant_id": 1,
+                    "rating_bucket": 3,
+                    "price_bucket": 2,
+                    "popularity_score": 8.0,
+                    "has_buffet": True,
+                    "is_cafe": False,
+                    "supports_online_order": True,
+                    "supports_table_booking": True,
+                    "search_text": "API Buffet Place Banashankari North Indian buffet",
+                    "embedding": embedding,
+                },
+                {
+                    "restaurant_id": 2,
+                    "rating_bucket": 1,
+                    "price_bucket": 2,
+                    "popularity_score": 2.0,
+                    "has_buffet": False,
+                    "is_cafe": False,
+                    "supports_online_order": False,
+                    "supports_table_booking": False,
+                    "search_text": "API Average Diner Banashankari",
+                    "embedding": embedding,
+                },
+            ],
         )
-        session.add_all([f1, f2])
-        session.commit()
 
 
-def test_health_endpoint():
-    client = TestClient(app)
+@pytest.fixture(scope="module")
+def client():
+    # Not entered as a context manager: the lifespan would initialise the
+    # real database, while these tests patch in their own engine
+    return TestClient(app)
+
+
+def test_health_endpoint(client):
     resp = client.get("/health")
     assert resp.status_code == 200
     data = resp.json()
     assert data["status"] == "ok"
 
 
-def test_recommendations_endpoint_returns_ranked_results(monkeypatch):
-    # Use an in-memory engine for this test and patch retrieval.get_engine
-    engine = _make_in_memory_engine()
+def test_index_served_as_cacheable_file(client):
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/html")
+    assert "etag" in resp.headers
+    assert resp.headers["cache-control"] == "public, max-age=300"
+
+
+def test_lookup_endpoints_support_etag_revalidation(monkeypatch, client):
+    monkeypatch.setattr("phase5_api.main.get_distinct_locations", lambda: ["Banashankari", "BTM"])
+
+    resp = client.get("/locations")
+    assert resp.status_code == 200
+    assert resp.json() == ["Banashankari", "BTM"]
+    assert resp.headers["cache-control"] == "public, max-age=3600"
+
+    etag = resp.headers["etag"]
+    resp = client.get("/locations", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+
+    # Weak tags, tag lists and "*" all revalidate
+    for header in (f"W/{etag}", f'"stale", {etag}', f'"stale",W/{etag}', "*"):
+        assert client.get("/locations", headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/locations", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_recommendations_endpoint_returns_ranked_results(monkeypatch, schema_engine, client):
+    # The in-memory engine uses StaticPool, so the endpoint's worker-thread
+    # queries see the rows seeded here
+    engine = schema_engine
     _seed_sample_data(engine)
 
     def fake_get_engine():
@@ -88,8 +123,6 @@ def test_recommendations_endpoint_returns_ranked_results(monkeypatch):
 
     monkeypatch.setattr("phase5_api.main.get_retrieval_engine", fake_get_engine)
 
-    client = TestClient(app)
-
     payload = {
         "query_text": "cheap north indian buffet in Banashankari",
         "location": "Banashankari",